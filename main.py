@@ -1,5 +1,7 @@
 from src.gui import build_gui
 from src.db import init_db
+from src.ai_tagger import preload_tag_cache
 init_db()
+preload_tag_cache()
 if __name__ == "__main__":
     build_gui()
\ No newline at end of file
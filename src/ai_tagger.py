@@ -1,104 +1,495 @@
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
 from textwrap import dedent
 import asyncio
+import atexit
 import json
+import logging
 import os
+import random
+import re
+import threading
+import time
 from dotenv import load_dotenv
 import aiohttp
 import openai
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from src.db import add_pending_batch, get_pending_batches, remove_pending_batch, update_tags_many
+from src.db import get_cached_tags, get_recent_cached_tags, upsert_tag_cache
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Raw model replies are only written when TIDYDESK_LOG_OPENAI is set
+_openai_log = None
+if os.getenv("TIDYDESK_LOG_OPENAI"):
+    _openai_log = logging.getLogger("tidydesk.openai")
+    _openai_log.setLevel(logging.INFO)
+    _openai_log.propagate = False
+    _log_handler = RotatingFileHandler("openai_log.json", maxBytes=5 * 1024 * 1024,
+                                       backupCount=2, encoding="utf-8")
+    _log_handler.setFormatter(logging.Formatter("%(message)s\n"))
+    _openai_log.addHandler(_log_handler)
+
 ENABLE_AI_TAGS = True
 BATCH_SIZE = 50
-SKIP_TAGS = {"image", "video", "audio"}
+SKIP_TAGS = frozenset({"image", "video", "audio"})
+MAX_CONCURRENT_BATCHES = 8
+MAX_RETRIES = 5
+RETRY_MAX_DELAY = 30  # seconds
+MAX_REQUESTS_PER_MINUTE = 500
+MAX_TOKENS_PER_MINUTE = 200_000
+MODEL = "gpt-4o-mini"  # needs structured-output (json_schema) support
+OPENAI_API_BASE = "https://api.openai.com/v1"
+TAG_CACHE_SIZE = 4096
+MAX_CONNECTIONS = 16
+
+# Static instructions shared by every batch. Keeping them identical (and first)
+# lets the API reuse the cached prompt prefix; only the filenames vary.
+_SYSTEM_PROMPT = dedent("""
+    You tag files by their filenames.
+    The user message lists one filename per line.
+    Respond with one entry per filename, copying the name exactly, and
+    2–5 descriptive single-word tags each.
+
+    Example entry:
+    {"name": "invoice_2023_q1.pdf", "tags": ["invoice", "finance", "Q1"]}
+""").strip()
+
+# Structured output: the API guarantees replies match this schema
+_TAG_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "tag_result",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "files": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "tags": {"type": "array", "items": {"type": "string"}}
+                        },
+                        "required": ["name", "tags"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["files"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def _chat_body(file_names):
+    """Chat completions request body shared by the sync, async and Batch API paths"""
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": "\n".join(file_names)},
+        ],
+        "response_format": _TAG_RESPONSE_FORMAT,
+        "temperature": 0.3
+    }
 
 def set_ai_enabled(enabled: bool):
     global ENABLE_AI_TAGS
     ENABLE_AI_TAGS = enabled
     print(f"AI tagging {'enabled' if enabled else 'disabled'}.")
-def get_batched_ai_tags(file_names):
-    if not ENABLE_AI_TAGS or not file_names:
-        return {}
 
-    prompt = dedent(f"""
-        You will receive a list of 50 filenames.
-        Return a JSON array where each object contains:
-        - name: the filename
-        - tags: a list of 2–5 descriptive tags (single words only)
+def set_max_concurrent_batches(count: int):
+    global MAX_CONCURRENT_BATCHES
+    MAX_CONCURRENT_BATCHES = max(1, int(count))
 
-        Example:
-        [
-          {{"name": "invoice_2023_q1.pdf", "tags": ["invoice", "finance", "Q1"]}},
-          ...
-        ]
+def _parse_tag_response(content):
+    """Turn the model's JSON reply into {lowercased name: "tag1, tag2"}.
 
-        Filenames:
-        {chr(10).join(file_names)}
-    """)
+    Entries are validated one by one, so a single malformed entry is skipped
+    instead of discarding the whole batch.
+    """
+    parsed = orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
+    entries = parsed.get("files", []) if isinstance(parsed, dict) else parsed
+    tag_map = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        name = entry.get("name")
+        tags = entry.get("tags")
+        if not isinstance(name, str) or not isinstance(tags, list):
+            continue
+        tags = [str(tag).strip() for tag in tags if str(tag).strip()]
+        if tags:
+            tag_map[name.strip().lower()] = ", ".join(tags)
+    return tag_map
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-        content = response['choices'][0]['message']['content']
+def pattern_key(file_name):
+    """Collapse digit runs so recurring names (Screenshot_2024-01-02.png) share a key"""
+    return re.sub(r'\d+', '#', file_name.strip().lower())
 
-        print("\n🔍 AI RAW RESPONSE:\n")
-        print(content[:1000])
+# In-memory LRU over the tag_cache table. Only hits are kept, so a pattern
+# tagged later is found in the DB without having to evict anything.
+_pattern_tags = OrderedDict()
+_pattern_tags_lock = threading.Lock()
 
-        with open("openai_log.json", "a", encoding="utf-8") as f:
-            f.write(content + "\n\n")
+def _cache_pattern_tags(pairs):
+    with _pattern_tags_lock:
+        for pattern, tags in pairs:
+            _pattern_tags[pattern] = tags
+            _pattern_tags.move_to_end(pattern)
+        while len(_pattern_tags) > TAG_CACHE_SIZE:
+            _pattern_tags.popitem(last=False)
 
-        parsed = json.loads(content)
-        return {entry["name"].strip().lower(): ", ".join(entry["tags"]) for entry in parsed}
-    except Exception as e:
-        print(f"OpenAI error during batch tagging: {e}")
-        return {}
+def _is_generic(tags):
+    """True if every tag is a SKIP_TAGS placeholder (e.g. just "image")"""
+    return {tag.strip().lower() for tag in tags.split(",") if tag.strip()} <= SKIP_TAGS
 
-async def async_get_batched_ai_tags(file_names):
+def preload_tag_cache():
+    """Fill the in-memory LRU from the tag_cache table; call once after init_db()"""
+    _cache_pattern_tags([(pattern, tags) for pattern, tags in get_recent_cached_tags(TAG_CACHE_SIZE)
+                         if not _is_generic(tags)])
+
+def tags_for_pattern(pattern):
+    """Tags previously returned for a filename pattern, or "" if none"""
+    with _pattern_tags_lock:
+        tags = _pattern_tags.get(pattern)
+        if tags is not None:
+            _pattern_tags.move_to_end(pattern)
+            return tags
+    tags = get_cached_tags(pattern) or ""
+    if _is_generic(tags):
+        return ""  # Rows stored before generic replies were filtered out
+    _cache_pattern_tags([(pattern, tags)])
+    return tags
+
+def _split_cached(file_names):
+    """Return (tag map for cache hits, names that still need the model)"""
+    hits, misses = {}, []
+    for name in file_names:
+        key = name.strip().lower()
+        tags = tags_for_pattern(pattern_key(key))
+        if tags:
+            hits[key] = tags
+        else:
+            misses.append(name)
+    return hits, misses
+
+def _tags_by_name(file_names, tag_map):
+    """(name, tags) for every name the tag map has tags for, normalising each name once"""
+    pairs = []
+    for name in file_names:
+        tags = tag_map.get(name.strip().lower())
+        if tags:
+            pairs.append((name, tags))
+    return pairs
+
+def _remember_tags(file_names, tag_map):
+    """Persist fresh model tags under each name's pattern, skipping generic replies"""
+    pairs = [(pattern_key(name), tags) for name, tags in _tags_by_name(file_names, tag_map)
+             if not _is_generic(tags)]
+    if pairs:
+        upsert_tag_cache(pairs)
+        _cache_pattern_tags(pairs)
+
+# All OpenAI traffic runs on one background event loop with one keep-alive
+# session, so watcher batches and organize runs reuse warm TLS connections
+# instead of handshaking on every call.
+_loop = None
+_loop_lock = threading.Lock()
+_session = None
+
+def submit_async(coro):
+    """Schedule a coroutine on the shared background loop; returns a concurrent Future"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="openai-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop)
+
+def run_async(coro):
+    """Run a coroutine on the shared background loop and wait for its result"""
+    return submit_async(coro).result()
+
+async def get_session():
+    """The shared aiohttp session; must be awaited on the background loop"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, ttl_dns_cache=300, keepalive_timeout=60)
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+@atexit.register
+def _close_session():
+    if _session is not None and not _session.closed:
+        try:
+            run_async(_session.close())
+        except Exception:
+            pass
+
+def get_batched_ai_tags(file_names):
     if not ENABLE_AI_TAGS or not file_names:
         return {}
 
-    prompt = dedent(f"""
-        You will receive a list of 50 filenames.
-        Return a JSON array where each object contains:
-        - name: the filename
-        - tags: a list of 2–5 descriptive tags (single words only)
+    tag_map, file_names = _split_cached(file_names)
+    if not file_names:
+        return tag_map
+
+    try:
+        fresh = run_async(_request_batch_tags(None, file_names))
+        _remember_tags(file_names, fresh)
+        tag_map.update(fresh)
+        return tag_map
+    except Exception as e:
+        print(f"OpenAI error during batch tagging: {e}")
+        return tag_map
+
+class RateLimiter:
+    """Token bucket that paces requests before OpenAI starts answering with 429s.
 
-        Example:
-        [
-          {{"name": "invoice_2023_q1.pdf", "tags": ["invoice", "finance", "Q1"]}},
-          ...
-        ]
+    Both buckets refill continuously in proportion to elapsed wall-clock time,
+    so a burst can use the full per-minute budget and then settles to the
+    steady rate.
+    """
 
-        Filenames:
-        {chr(10).join(file_names)}
-    """)
+    def __init__(self, max_requests_per_minute=MAX_REQUESTS_PER_MINUTE,
+                 max_tokens_per_minute=MAX_TOKENS_PER_MINUTE):
+        self.max_requests_per_minute = float(max_requests_per_minute)
+        self.max_tokens_per_minute = float(max_tokens_per_minute)
+        self.rpm_capacity = self.max_requests_per_minute
+        self.tpm_capacity = self.max_tokens_per_minute
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
 
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.rpm_capacity = min(self.max_requests_per_minute,
+                                self.rpm_capacity + elapsed * self.max_requests_per_minute / 60)
+        self.tpm_capacity = min(self.max_tokens_per_minute,
+                                self.tpm_capacity + elapsed * self.max_tokens_per_minute / 60)
+
+    async def acquire(self, est_tokens=0):
+        """Wait until one request and `est_tokens` tokens fit in the budget"""
+        # A single request larger than the whole bucket would otherwise wait forever
+        est_tokens = min(est_tokens, self.max_tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.rpm_capacity >= 1 and self.tpm_capacity >= est_tokens:
+                    self.rpm_capacity -= 1
+                    self.tpm_capacity -= est_tokens
+                    return
+                wait = max((1 - self.rpm_capacity) * 60 / self.max_requests_per_minute,
+                           (est_tokens - self.tpm_capacity) * 60 / self.max_tokens_per_minute)
+                await asyncio.sleep(wait)
+
+async def _request_batch_tags(session, file_names, limiter=None):
+    """POST one batch to the chat completions endpoint and parse the tag map.
+
+    Uses the shared session when `session` is None. Raises on HTTP or parse
+    errors so callers can decide whether to retry.
+    """
+    if session is None:
+        session = await get_session()
     headers = {
         "Authorization": f"Bearer {openai.api_key}",
         "Content-Type": "application/json"
     }
 
-    body = {
-        "model": "gpt-3.5-turbo",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
+    body = _chat_body(file_names)
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post("https://api.openai.com/v1/chat/completions", headers=headers, json=body) as resp:
-                result = await resp.json()
-                content = result['choices'][0]['message']['content']
+    if limiter is not None:
+        prompt_chars = sum(len(m["content"]) for m in body["messages"])
+        await limiter.acquire(est_tokens=prompt_chars // 4)
+
+    async with session.post(f"{OPENAI_API_BASE}/chat/completions", headers=headers, json=body) as resp:
+        resp.raise_for_status()
+        result = await resp.json()
+        content = result['choices'][0]['message']['content']
+        if _openai_log:
+            _openai_log.info(content)
+
+        return _parse_tag_response(content)
 
-                with open("openai_log.json", "a", encoding="utf-8") as f:
-                    f.write(content + "\n\n")
+async def async_get_batched_ai_tags(file_names, session=None):
+    if not ENABLE_AI_TAGS or not file_names:
+        return {}
 
-                parsed = json.loads(content)
-                return {entry["name"].strip().lower(): ", ".join(entry["tags"]) for entry in parsed}
+    try:
+        return await _request_batch_tags(session, file_names)
     except Exception as e:
         print(f"[async] OpenAI error: {e}")
         return {}
+
+def _is_retryable(error):
+    """Rate limits, server errors and dropped connections are worth retrying"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+async def tag_all_batches(batches, concurrency=None,
+                          max_requests_per_minute=MAX_REQUESTS_PER_MINUTE,
+                          max_tokens_per_minute=MAX_TOKENS_PER_MINUTE, on_batch=None,
+                          use_cache=True):
+    """Tag every batch of filenames concurrently.
+
+    At most `concurrency` requests (default MAX_CONCURRENT_BATCHES, set from
+    the AI tab) are in flight at once and a shared
+    RateLimiter keeps them under the per-minute request/token budget;
+    retryable failures back off exponentially with jitter. Returns one tag
+    map per batch, in the same order as `batches` (an empty map for batches
+    that failed). Names whose pattern is already in the tag cache are
+    answered locally and never sent, unless `use_cache` is False (retag,
+    where the cached answer is the one being replaced). If given, `on_batch(index, tag_map)` is
+    called on the loop thread as each batch finishes, so callers can start
+    using results before the slowest batch is back.
+    """
+    if not ENABLE_AI_TAGS:
+        if on_batch:
+            for index in range(len(batches)):
+                on_batch(index, {})
+        return [{} for _ in batches]
+
+    semaphore = asyncio.Semaphore(concurrency or MAX_CONCURRENT_BATCHES)
+    limiter = RateLimiter(max_requests_per_minute, max_tokens_per_minute)
+
+    async def tag_one(session, file_names):
+        # SQLite calls run in a worker thread so a held DB lock never stalls the loop
+        if use_cache:
+            tag_map, file_names = await asyncio.to_thread(_split_cached, file_names)
+        else:
+            tag_map = {}
+        if not file_names:
+            return tag_map
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                async with semaphore:
+                    fresh = await _request_batch_tags(session, file_names, limiter)
+                await asyncio.to_thread(_remember_tags, file_names, fresh)
+                tag_map.update(fresh)
+                return tag_map
+            except Exception as e:
+                if attempt == MAX_RETRIES or not _is_retryable(e):
+                    print(f"[async] OpenAI error after {attempt} attempt(s): {e}")
+                    return tag_map
+                delay = min(RETRY_MAX_DELAY, 2 ** attempt) * random.uniform(0.5, 1.0)
+                await asyncio.sleep(delay)
+
+    async def tag_and_report(session, index, file_names):
+        tag_map = await tag_one(session, file_names)
+        if on_batch:
+            on_batch(index, tag_map)
+        return tag_map
+
+    session = await get_session()
+    return await asyncio.gather(*(tag_and_report(session, index, names)
+                                  for index, names in enumerate(batches)))
+
+# --- OpenAI Batch API (asynchronous, ~50% cheaper, 24h completion window) ---
+
+def _batch_request_line(custom_id, file_names):
+    """One JSONL line of the Batch API input file"""
+    return json.dumps({
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": _chat_body(file_names)
+    })
+
+async def _submit_batch_job(file_names):
+    lines = [_batch_request_line(f"retag-{i // BATCH_SIZE}", file_names[i:i+BATCH_SIZE])
+             for i in range(0, len(file_names), BATCH_SIZE)]
+
+    form = aiohttp.FormData()
+    form.add_field("purpose", "batch")
+    form.add_field("file", "\n".join(lines).encode("utf-8"),
+                   filename="retag_batch.jsonl", content_type="application/jsonl")
+
+    headers = {"Authorization": f"Bearer {openai.api_key}"}
+    session = await get_session()
+    async with session.post(f"{OPENAI_API_BASE}/files", data=form, headers=headers) as resp:
+        resp.raise_for_status()
+        input_file_id = (await resp.json())["id"]
+
+    async with session.post(f"{OPENAI_API_BASE}/batches", headers=headers, json={
+        "input_file_id": input_file_id,
+        "endpoint": "/v1/chat/completions",
+        "completion_window": "24h"
+    }) as resp:
+        resp.raise_for_status()
+        return (await resp.json())["id"]
+
+def submit_retag_batch(filenames):
+    """Queue `filenames` for retagging through the OpenAI Batch API.
+
+    The job is recorded in the pending_batches table and applied later by
+    poll_batches(). Returns the batch id.
+    """
+    batch_id = run_async(_submit_batch_job(filenames))
+    add_pending_batch(batch_id, filenames)
+    return batch_id
+
+async def _collect_finished_batches(pending, log_callback):
+    """Fetch results for finished batches; returns [(batch_id, tag_map)]"""
+    finished = []
+    headers = {"Authorization": f"Bearer {openai.api_key}"}
+    session = await get_session()
+    for batch_id, _ in pending:
+        async with session.get(f"{OPENAI_API_BASE}/batches/{batch_id}", headers=headers) as resp:
+            resp.raise_for_status()
+            batch = await resp.json()
+
+        status = batch.get("status")
+        if status in ("failed", "expired", "cancelled"):
+            log_callback(f"⚠️ Batch {batch_id} ended with status '{status}'.")
+            finished.append((batch_id, {}))
+            continue
+        if status != "completed":
+            continue
+
+        tag_map = {}
+        if batch.get("output_file_id"):
+            async with session.get(f"{OPENAI_API_BASE}/files/{batch['output_file_id']}/content", headers=headers) as resp:
+                resp.raise_for_status()
+                output = await resp.text()
+            for line in output.splitlines():
+                try:
+                    result = json.loads(line)
+                    content = result["response"]["body"]["choices"][0]["message"]["content"]
+                    tag_map.update(_parse_tag_response(content))
+                except Exception as e:
+                    log_callback(f"⚠️ Skipping unreadable batch result: {e}")
+        finished.append((batch_id, tag_map))
+    return finished
+
+def poll_batches(log_callback=print):
+    """Apply the results of any completed Batch API retag jobs.
+
+    Returns the number of files whose tags were updated.
+    """
+    pending = get_pending_batches()
+    if not pending or not ENABLE_AI_TAGS:
+        return 0
+
+    filenames_by_batch = dict(pending)
+    updated = 0
+    for batch_id, tag_map in run_async(_collect_finished_batches(pending, log_callback)):
+        pairs = _tags_by_name(filenames_by_batch[batch_id], tag_map)
+        update_tags_many(pairs)
+        _remember_tags(filenames_by_batch[batch_id], tag_map)
+        remove_pending_batch(batch_id)
+        updated += len(pairs)
+        if tag_map:
+            log_callback(f"📬 Batch {batch_id} applied: {len(pairs)} file(s) retagged.")
+    return updated
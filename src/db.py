@@ -1,13 +1,45 @@
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+import json
 import sqlite3
+import threading
 
 DB_PATH = Path("file_index.db")
 
+# One shared connection for the whole app instead of a connect/commit/close
+# cycle per row. Autocommit mode (isolation_level=None) lets insert_many wrap
+# a whole batch in a single explicit transaction.
+_conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.execute("PRAGMA temp_store=MEMORY")
+_conn.execute("PRAGMA cache_size=-65536")
+_lock = threading.Lock()
+
+@contextmanager
+def get_conn():
+    """Yield the shared connection, holding the lock for the whole block"""
+    with _lock:
+        yield _conn
+
+# Reads go through a per-thread read-only connection so long scans never
+# hold _lock; WAL lets them run alongside writes on the shared connection.
+_read_local = threading.local()
+
+@contextmanager
+def get_read_conn():
+    """Yield this thread's read-only connection (no lock needed)"""
+    conn = getattr(_read_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(f"{DB_PATH.resolve().as_uri()}?mode=ro", uri=True)
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _read_local.conn = conn
+    yield conn
+
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS files (
+    with _lock:
+        _conn.execute('''CREATE TABLE IF NOT EXISTS files (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             original_name TEXT,
             new_path TEXT,
@@ -15,23 +47,153 @@ def init_db():
             moved_at TEXT,
             tags TEXT
         )''')
-        conn.commit()
+        # UPDATE/DELETE helpers and regrouping all look rows up by name or path
+        has_indexes = _conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_files_original_name'").fetchone()
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_files_original_name ON files(original_name)")
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_files_new_path ON files(new_path)")
+        # No index on tags: the retag query ORs LIKE '%, tag, %' patterns and
+        # scans the table regardless, so one would only slow down writes
+        _conn.execute("DROP INDEX IF EXISTS idx_files_tags")
+        if not has_indexes:
+            _conn.execute("ANALYZE")
+        _init_fts()
+        # OpenAI Batch API jobs submitted by "Retag (Batch API)" and not yet applied
+        _conn.execute('''CREATE TABLE IF NOT EXISTS pending_batches (
+            batch_id TEXT PRIMARY KEY,
+            created_at TEXT,
+            filenames TEXT
+        )''')
+        # AI tags keyed by digit-normalized filename pattern (see ai_tagger.pattern_key)
+        _conn.execute('''CREATE TABLE IF NOT EXISTS tag_cache (
+            pattern TEXT PRIMARY KEY,
+            tags TEXT
+        )''')
+
+# Full-text index over file names and tags, kept in sync with `files` by
+# triggers. `files` stays the source of truth (external content table).
+_FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    original_name, tags,
+    content='files', content_rowid='id',
+    tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS files_fts_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts(rowid, original_name, tags) VALUES (new.id, new.original_name, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS files_fts_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, original_name, tags) VALUES ('delete', old.id, old.original_name, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS files_fts_au AFTER UPDATE OF original_name, tags ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, original_name, tags) VALUES ('delete', old.id, old.original_name, old.tags);
+    INSERT INTO files_fts(rowid, original_name, tags) VALUES (new.id, new.original_name, new.tags);
+END;
+'''
+
+def _init_fts():
+    """Create the FTS5 index, backfilling it from existing rows the first time"""
+    try:
+        existed = _conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'files_fts'").fetchone()
+        _conn.executescript(_FTS_SCHEMA)
+        if not existed:
+            _conn.execute("INSERT INTO files_fts(files_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5 - search falls back to LIKE queries
+        print(f"Full-text search unavailable: {e}")
 
 def insert_into_db(original_name, new_path, file_type, tags):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute('INSERT INTO files (original_name, new_path, file_type, moved_at, tags) VALUES (?, ?, ?, ?, ?)',
-                  (original_name, new_path, file_type, datetime.now().isoformat(), tags))
-        conn.commit()
+    insert_many([(original_name, new_path, file_type, tags)])
+
+def insert_many(rows):
+    """Insert (original_name, new_path, file_type, tags) rows in one transaction"""
+    if not rows:
+        return
+    moved_at = datetime.now().isoformat()
+    with _lock:
+        _conn.execute("BEGIN")
+        try:
+            _conn.executemany('INSERT INTO files (original_name, new_path, file_type, moved_at, tags) VALUES (?, ?, ?, ?, ?)',
+                              [(name, path, file_type, moved_at, tags) for name, path, file_type, tags in rows])
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
 
 def update_tags_in_db(filename, tags):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute('UPDATE files SET tags = ? WHERE original_name = ?', (tags, filename))
-        conn.commit()
+    with _lock:
+        _conn.execute('UPDATE files SET tags = ? WHERE original_name = ?', (tags, filename))
+
+def update_tags_many(pairs):
+    """Apply (filename, tags) pairs in one transaction"""
+    if not pairs:
+        return
+    with _lock:
+        _conn.execute("BEGIN")
+        try:
+            _conn.executemany('UPDATE files SET tags = ? WHERE original_name = ?',
+                              [(tags, filename) for filename, tags in pairs])
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+
+def update_paths_many(pairs):
+    """Apply (filename, new_path) pairs in one transaction"""
+    if not pairs:
+        return
+    with _lock:
+        _conn.execute("BEGIN")
+        try:
+            _conn.executemany('UPDATE files SET new_path = ? WHERE original_name = ?',
+                              [(new_path, filename) for filename, new_path in pairs])
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
+
+def update_file_record(filename, new_path, tags):
+    with _lock:
+        _conn.execute("UPDATE files SET new_path = ?, tags = ? WHERE original_name = ?", (new_path, tags, filename))
 
 def delete_file_record(filename):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("DELETE FROM files WHERE original_name = ?", (filename,))
-        conn.commit()
\ No newline at end of file
+    with _lock:
+        _conn.execute("DELETE FROM files WHERE original_name = ?", (filename,))
+
+def add_pending_batch(batch_id, filenames):
+    with _lock:
+        _conn.execute("INSERT OR REPLACE INTO pending_batches (batch_id, created_at, filenames) VALUES (?, ?, ?)",
+                      (batch_id, datetime.now().isoformat(), json.dumps(filenames)))
+
+def get_pending_batches():
+    """Return [(batch_id, filenames)] for batches that have not been applied yet"""
+    with get_read_conn() as conn:
+        rows = conn.execute("SELECT batch_id, filenames FROM pending_batches ORDER BY created_at").fetchall()
+    return [(batch_id, json.loads(filenames or "[]")) for batch_id, filenames in rows]
+
+def remove_pending_batch(batch_id):
+    with _lock:
+        _conn.execute("DELETE FROM pending_batches WHERE batch_id = ?", (batch_id,))
+
+def get_cached_tags(pattern):
+    with get_read_conn() as conn:
+        row = conn.execute("SELECT tags FROM tag_cache WHERE pattern = ?", (pattern,)).fetchone()
+    return row[0] if row else None
+
+def get_recent_cached_tags(limit):
+    """Return up to `limit` (pattern, tags) rows, oldest first so the newest end up most recent in an LRU"""
+    with get_read_conn() as conn:
+        rows = conn.execute("SELECT pattern, tags FROM tag_cache ORDER BY rowid DESC LIMIT ?", (limit,)).fetchall()
+    return rows[::-1]
+
+def upsert_tag_cache(pairs):
+    """Store (pattern, tags) pairs in one transaction"""
+    if not pairs:
+        return
+    with _lock:
+        _conn.execute("BEGIN")
+        try:
+            _conn.executemany("INSERT OR REPLACE INTO tag_cache (pattern, tags) VALUES (?, ?)", pairs)
+            _conn.execute("COMMIT")
+        except Exception:
+            _conn.execute("ROLLBACK")
+            raise
@@ -1,18 +1,23 @@
 import os
 import json
+import queue
 import threading
 import time
 from pathlib import Path
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
 from datetime import datetime
-import sqlite3
 
 # Import from existing modules
-from src.ai_tagger import get_batched_ai_tags
+from src.ai_tagger import get_batched_ai_tags, poll_batches, BATCH_SIZE
 from src.index_files import start_indexing_threaded
 from src.organizer import process_batch, get_category, ORGANIZED, enhanced_history, DESKTOP
-from src.db import insert_into_db, DB_PATH
+from src.db import get_pending_batches, insert_many, update_file_record, update_tags_in_db
+
+BATCH_POLL_INTERVAL = 300  # seconds between checks for finished Batch API retag jobs
+COALESCE_WINDOW = 1.5  # seconds to gather new files into one tagging batch
+POLLING_INTERVAL = 1  # seconds between scans when use_polling is on
 
 class DesktopFileHandler(FileSystemEventHandler):
     """Handler for desktop file events"""
@@ -32,11 +37,7 @@ class DesktopFileHandler(FileSystemEventHandler):
         if file_path.name.startswith('.') or file_path.suffix.lower() in ['.tmp', '.temp', '.part']:
             return
 
-        # Small delay to ensure file is fully written
-        time.sleep(0.5)
-
-        if file_path.exists():
-            self.watcher.process_new_file(file_path)
+        self.watcher.enqueue_new_file(file_path)
 
 class DesktopWatcher:
     """Real-time desktop file monitoring system"""
@@ -51,6 +52,60 @@ class DesktopWatcher:
         # Desktop path
         self.desktop_path = DESKTOP
 
+        # New files are coalesced here and tagged in batches by _batch_worker,
+        # which only runs while monitoring is on
+        self.pending_files = queue.Queue()
+        self.batch_worker_thread = None
+        self._worker_stop = threading.Event()
+
+        # Applies finished Batch API retag jobs; runs only while jobs are pending,
+        # whether or not live monitoring is on
+        self.batch_poll_thread = None
+
+    def start_batch_polling(self):
+        """Start the Batch API poller if it isn't running (it exits once nothing is pending)"""
+        if self.batch_poll_thread and self.batch_poll_thread.is_alive():
+            return
+        self.batch_poll_thread = threading.Thread(target=self._poll_batches_loop, daemon=True)
+        self.batch_poll_thread.start()
+
+    def _poll_batches_loop(self):
+        """Periodically apply the results of completed Batch API retag jobs"""
+        while get_pending_batches():
+            try:
+                poll_batches(self.log_callback or print)
+            except Exception as e:
+                if self.log_callback:
+                    self.log_callback(f"❌ Error polling retag batches: {e}")
+            time.sleep(BATCH_POLL_INTERVAL)
+
+    def enqueue_new_file(self, file_path):
+        """Queue a newly created file for the next tagging batch"""
+        self.pending_files.put((file_path, time.monotonic()))
+
+    def _batch_worker(self, stop_event):
+        """Gather queued files until the batch is full or the oldest is COALESCE_WINDOW old"""
+        while not stop_event.is_set():
+            try:
+                file_path, queued_at = self.pending_files.get(timeout=1)
+            except queue.Empty:
+                continue
+            batch = [file_path]
+            deadline = queued_at + COALESCE_WINDOW
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending_files.get(timeout=remaining)[0])
+                except queue.Empty:
+                    break
+
+            # Waiting out the window also gives writers time to finish the file
+            paths = [p for p in dict.fromkeys(batch) if p.exists()]
+            if paths:
+                self.process_new_files(paths)
+
     def get_desktop_path(self):
         """Get the desktop path based on OS"""
         if os.name == 'nt':  # Windows
@@ -66,13 +121,15 @@ class DesktopWatcher:
                 return config.get("watcher_settings", {
                     "live_monitor": False,
                     "auto_ai_tagging": True,
-                    "organize_to": "Desktop Folder"  # Options: "Desktop Folder", "Organized Folder", "Do Not Move"
+                    "organize_to": "Desktop Folder",  # Options: "Desktop Folder", "Organized Folder", "Do Not Move"
+                    "use_polling": False  # Poll instead of OS events (network mounts can miss events)
                 })
         except:
             return {
                 "live_monitor": False,
                 "auto_ai_tagging": True,
-                "organize_to": "Desktop Folder"
+                "organize_to": "Desktop Folder",
+                "use_polling": False
             }
 
     def save_settings(self):
@@ -99,12 +156,21 @@ class DesktopWatcher:
                     self.log_callback(f"❌ Desktop path not found: {self.desktop_path}")
                 return
 
-            self.observer = Observer()
+            if self.settings.get("use_polling", False):
+                self.observer = PollingObserver(timeout=POLLING_INTERVAL)
+            else:
+                self.observer = Observer()
             self.handler = DesktopFileHandler(self)
             self.observer.schedule(self.handler, str(self.desktop_path), recursive=False)
             self.observer.start()
             self.is_running = True
 
+            self._worker_stop = threading.Event()
+            self.batch_worker_thread = threading.Thread(target=self._batch_worker, args=(self._worker_stop,), daemon=True)
+            self.batch_worker_thread.start()
+            # Pick up Batch API jobs left pending by an earlier run
+            self.start_batch_polling()
+
             if self.log_callback:
                 self.log_callback(f"👀 Live monitoring started for: {self.desktop_path}")
 
@@ -126,6 +192,10 @@ class DesktopWatcher:
                 self.observer.join(timeout=5)
                 self.observer = None
 
+            # The batch worker exits promptly; the Batch API poller keeps
+            # going until submitted jobs are applied
+            self._worker_stop.set()
+
             self.handler = None
             self.is_running = False
 
@@ -139,17 +209,20 @@ class DesktopWatcher:
             if self.log_callback:
                 self.log_callback(f"❌ Error stopping monitoring: {e}")
 
-    def process_new_file(self, file_path):
-        """Process a newly detected file"""
-        try:
-            # Always index the file first
-            self.index_file(file_path)
+    def process_new_files(self, file_paths):
+        """Index, tag (one request per batch) and move newly detected files"""
+        self.index_files(file_paths)
 
-            tags = ""
-            # Get AI tags if enabled
-            if self.settings.get("auto_ai_tagging", True):
-                tags = self.get_ai_tags_for_file(file_path)
+        tag_map = {}
+        if self.settings.get("auto_ai_tagging", True):
+            tag_map = self.get_ai_tags_for_files(file_paths)
 
+        for file_path in file_paths:
+            self.process_new_file(file_path, tag_map.get(file_path.name.strip().lower(), ""))
+
+    def process_new_file(self, file_path, tags=""):
+        """Move an indexed file and report the result"""
+        try:
             # Move file based on settings
             moved_to = self.move_file_based_on_setting(file_path, tags)
 
@@ -175,26 +248,23 @@ class DesktopWatcher:
             if self.log_callback:
                 self.log_callback(f"❌ Error processing {file_path.name}: {e}")
 
-    def index_file(self, file_path):
-        """Index a single file in the database"""
+    def index_files(self, file_paths):
+        """Index a batch of files in the database with one transaction"""
         try:
-            # Insert into database directly (simpler than threading for single files)
-            file_type = file_path.suffix or "unknown"
-            insert_into_db(file_path.name, str(file_path), file_type, "")
+            insert_many([(p.name, str(p), p.suffix or "unknown", "") for p in file_paths])
 
         except Exception as e:
             if self.log_callback:
-                self.log_callback(f"❌ Error indexing {file_path.name}: {e}")
+                self.log_callback(f"❌ Error indexing {len(file_paths)} file(s): {e}")
 
-    def get_ai_tags_for_file(self, file_path):
-        """Get AI tags for a single file"""
+    def get_ai_tags_for_files(self, file_paths):
+        """Get AI tags for a batch of files with a single request"""
         try:
-            tag_map = get_batched_ai_tags([file_path.name])
-            return tag_map.get(file_path.name.strip().lower(), "")
+            return get_batched_ai_tags([p.name for p in file_paths])
         except Exception as e:
             if self.log_callback:
-                self.log_callback(f"❌ Error getting AI tags for {file_path.name}: {e}")
-            return ""
+                self.log_callback(f"❌ Error getting AI tags for {len(file_paths)} file(s): {e}")
+            return {}
 
     def move_file_based_on_setting(self, file_path, tags=""):
         """Move file based on the organize_to setting"""
@@ -261,13 +331,7 @@ class DesktopWatcher:
     def update_file_record(self, filename, new_path, tags):
         """Update file record in database"""
         try:
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                c.execute(
-                    "UPDATE files SET new_path = ?, tags = ? WHERE original_name = ?",
-                    (new_path, tags, filename)
-                )
-                conn.commit()
+            update_file_record(filename, new_path, tags)
         except Exception as e:
             if self.log_callback:
                 self.log_callback(f"❌ Error updating database: {e}")
@@ -275,13 +339,7 @@ class DesktopWatcher:
     def update_file_tags(self, filename, tags):
         """Update only tags in database"""
         try:
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                c.execute(
-                    "UPDATE files SET tags = ? WHERE original_name = ?",
-                    (tags, filename)
-                )
-                conn.commit()
+            update_tags_in_db(filename, tags)
         except Exception as e:
             if self.log_callback:
                 self.log_callback(f"❌ Error updating tags: {e}")
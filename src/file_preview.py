@@ -4,27 +4,167 @@ File Preview Module
 Provides comprehensive file preview functionality for various file types
 """
 
+import codecs
+import hashlib
+import io
+import mmap
 import os
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from tkinter import messagebox, END
 from pathlib import Path
 from datetime import datetime
 import subprocess
 import platform
 import mimetypes
+import tempfile
 
 try:
-    from PIL import Image, ImageTk
+    from PIL import Image, ImageTk, __version__ as PIL_VERSION
     PIL_AVAILABLE = True
+    # Pillow-SIMD is a drop-in build with SSE4/AVX2 resamplers; its versions end in ".postN"
+    PIL_SIMD = ".post" in PIL_VERSION
 except ImportError:
     PIL_AVAILABLE = False
+    PIL_SIMD = False
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
 
 import ttkbootstrap as ttk
 from ttkbootstrap.scrolled import ScrolledText
 from ttkbootstrap.constants import INFO, SUCCESS, PRIMARY, WARNING, SECONDARY, DANGER
 
+# Text previews insert about this many characters up front and the rest as the user scrolls
+PREVIEW_PAGE_CHARS = 64 * 1024
+# Archive listings stop after this many entries
+MAX_ARCHIVE_ENTRIES = 2000
+
+# Bytes shown in the binary hex dump (from each end of large files)
+HEX_PREVIEW_BYTES = 1024
+# Text files over max_preview_size show this much from each end
+TEXT_HEAD_TAIL_BYTES = 256 * 1024
+
+# Maps every byte to itself if printable ASCII, else to "." (for hex dumps)
+_PRINTABLE = bytes(b if 32 <= b <= 126 else 0x2E for b in range(256))
+
+# Images up to this size are read in one go; larger ones are memory-mapped
+IMAGE_READ_ALL_BYTES = 8 * 1024 * 1024
+
+# Downscaled image previews, reused across refreshes and sessions
+THUMB_CACHE_DIR = Path.home() / ".cache" / "tidydesk" / "thumbs"
+# Least recently used thumbnails beyond this many are deleted
+THUMB_CACHE_MAX_FILES = 1000
+
+def thumb_cache_path(file_path, head, max_size, mode, resample):
+    """Cache location for a preview of file_path, keyed by its first bytes, mtime and filter"""
+    st = os.stat(file_path)
+    digest = xxhash.xxh128(head).hexdigest() if XXHASH_AVAILABLE else hashlib.blake2b(head, digest_size=16).hexdigest()
+    # JPEG has no alpha channel, so transparent images are cached as PNG
+    ext = "png" if mode in ("RGBA", "LA", "P", "PA") else "jpg"
+    return THUMB_CACHE_DIR / f"{digest}_{st.st_mtime_ns}_{max_size[0]}x{max_size[1]}_{resample.name.lower()}.{ext}"
+
+def save_thumb(thumb, thumb_path):
+    """Write a thumbnail to a temp file and rename it into place, then prune the cache"""
+    fd, tmp_path = tempfile.mkstemp(dir=THUMB_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if thumb_path.suffix == ".jpg":
+                thumb.convert("RGB").save(f, "JPEG", quality=85, optimize=True)
+            else:
+                thumb.save(f, "PNG")
+        # Readers only ever see a complete file, even with two pools writing
+        os.replace(tmp_path, thumb_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    prune_thumb_cache()
+
+def prune_thumb_cache(max_files=THUMB_CACHE_MAX_FILES):
+    """Delete the least recently used thumbnails above max_files (e.g. orphans of edited images)"""
+    with os.scandir(THUMB_CACHE_DIR) as it:
+        entries = [(e.stat().st_mtime_ns, e.path) for e in it if e.is_file()]
+    if len(entries) <= max_files:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - max_files]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass  # Already removed by another pool
+
+def read_head_tail(path, n):
+    """(first n bytes, file size, last n bytes); the tail is empty if the file fits in 2n"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= 2 * n:
+            return f.read(), size, b""
+        head = f.read(n)
+        f.seek(-n, os.SEEK_END)
+        return head, size, f.read(n)
+
+def _hex_lines(data, offset=0):
+    """Hex dump rows for data; hex() and translate() format every byte in C"""
+    hex_str = data.hex(' ')
+    ascii_str = data.translate(_PRINTABLE).decode('latin-1')
+    return [f"{offset + i:08x}: {hex_str[i*3:(i+16)*3-1]:<48} |{ascii_str[i:i+16]}|"
+            for i in range(0, len(data), 16)]
+
+@lru_cache(maxsize=512)
+def _guess_mime(path_str):
+    """MIME type from the file name alone, so it never goes stale"""
+    return mimetypes.guess_type(path_str)[0]
+
+def _stat_and_mime(path_str):
+    """(size, mtime, MIME type) for a path; the stat is always fresh"""
+    st = os.stat(path_str)
+    return st.st_size, st.st_mtime, _guess_mime(path_str)
+
+def detect_encoding(sample, final=True):
+    """Guess the text encoding from the file's first bytes (final: sample is the whole file)"""
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # A truncated sample may end mid-character; only a complete file must decode fully
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    if CHARSET_NORMALIZER_AVAILABLE:
+        best = from_bytes(sample).best()
+        if best:
+            return best.encoding
+    return 'latin-1'
+
 class FilePreviewWindow:
     """Enhanced file preview window with support for multiple file types"""
+
+    # Supported file types (shared by all instances)
+    IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.tiff', '.webp'})
+    TEXT_EXTENSIONS = frozenset({'.txt', '.py', '.js', '.html', '.css', '.json', '.xml', '.md', '.csv', '.log', '.ini', '.cfg'})
+    CODE_EXTENSIONS = frozenset({'.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.h', '.php', '.rb', '.go', '.rs', '.ts', '.jsx', '.tsx'})
+    DOCUMENT_EXTENSIONS = frozenset({'.pdf', '.docx', '.doc', '.rtf', '.odt'})
+    ARCHIVE_EXTENSIONS = frozenset({'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2'})
+    TEXT_OR_CODE_EXTENSIONS = TEXT_EXTENSIONS | CODE_EXTENSIONS
+
+    # Extension -> preview method; later entries win (.pdf is also a document)
+    PREVIEW_DISPATCH = {
+        **dict.fromkeys(DOCUMENT_EXTENSIONS, 'preview_document'),
+        **dict.fromkeys(ARCHIVE_EXTENSIONS, 'preview_archive'),
+        '.pdf': 'preview_pdf',
+        **dict.fromkeys(TEXT_OR_CODE_EXTENSIONS, 'preview_text'),
+        **dict.fromkeys(IMAGE_EXTENSIONS, 'preview_image'),
+    }
     
     def __init__(self, parent, file_path=None):
         self.parent = parent
@@ -32,15 +172,19 @@ class FilePreviewWindow:
         self.preview_window = None
         self.current_image = None  # Keep reference to prevent garbage collection
         
-        # Supported file types
-        self.image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.tiff', '.webp'}
-        self.text_extensions = {'.txt', '.py', '.js', '.html', '.css', '.json', '.xml', '.md', '.csv', '.log', '.ini', '.cfg'}
-        self.code_extensions = {'.py', '.js', '.html', '.css', '.java', '.cpp', '.c', '.h', '.php', '.rb', '.go', '.rs', '.ts', '.jsx', '.tsx'}
-        self.document_extensions = {'.pdf', '.docx', '.doc', '.rtf', '.odt'}
-        self.archive_extensions = {'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2'}
-        
-        # Maximum file size for preview (10MB)
+        # Text files above this size (10MB) are previewed by their first and last bytes
         self.max_preview_size = 10 * 1024 * 1024
+
+        # Slow decodes run here so the Tk main loop stays responsive
+        self._pool = ThreadPoolExecutor(max_workers=2)
+        self._active_future = None
+        self._resize_job = None
+        self._canvas_width = None
+        self.max_image_size = (750, 500)
+        try:
+            THUMB_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            pass
         
     def show_preview(self, file_path=None):
         """Show preview window for the specified file"""
@@ -58,8 +202,9 @@ class FilePreviewWindow:
         self.preview_window = ttk.Toplevel(self.parent)
         self.preview_window.title(f"File Preview - {self.file_path.name}")
         self.preview_window.geometry("800x600")
+        # Non-modal: the rest of the app stays usable while a slow preview loads
         self.preview_window.transient(self.parent)
-        self.preview_window.grab_set()
+        self.preview_window.protocol("WM_DELETE_WINDOW", self.close_preview)
         
         # Main container
         main_frame = ttk.Frame(self.preview_window)
@@ -84,10 +229,9 @@ class FilePreviewWindow:
         
         # Get file stats
         try:
-            stat = self.file_path.stat()
-            file_size = self.format_file_size(stat.st_size)
-            modified_time = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-            mime_type, _ = mimetypes.guess_type(str(self.file_path))
+            size, mtime, mime_type = _stat_and_mime(str(self.file_path))
+            file_size = self.format_file_size(size)
+            modified_time = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
             
             info_text = f"""Name: {self.file_path.name}
 Size: {file_size}
@@ -156,6 +300,16 @@ Location: {self.file_path.parent}"""
             bootstyle=PRIMARY,
             command=self.choose_new_file
         ).pack(side=tk.LEFT, padx=5)
+
+        # LANCZOS resampling for image previews; cheap enough to default on with Pillow-SIMD
+        self.high_quality_var = tk.BooleanVar(value=PIL_SIMD)
+        self.high_quality_check = ttk.Checkbutton(
+            left_frame,
+            text="✨ High Quality",
+            variable=self.high_quality_var,
+            command=self.reload_image_preview
+        )
+        self.high_quality_check.pack(side=tk.LEFT, padx=5)
         
         # Right side buttons
         right_frame = ttk.Frame(controls_frame)
@@ -172,25 +326,21 @@ Location: {self.file_path.parent}"""
             right_frame,
             text="❌ Close",
             bootstyle=DANGER,
-            command=self.preview_window.destroy
+            command=self.close_preview
         ).pack(side=tk.RIGHT, padx=5)
     
     def load_file_preview(self):
         """Load and display file preview based on file type"""
-        if not self.file_path.exists():
+        if self._active_future:
+            self._active_future.cancel()
+        self._active_future = None  # Drop any load still in flight
+
+        # Large files are still previewed; the loaders only read what they show
+        try:
+            os.stat(self.file_path)
+        except FileNotFoundError:
             self.show_error_message("File not found")
             return
-        
-        # Check file size
-        try:
-            file_size = self.file_path.stat().st_size
-            if file_size > self.max_preview_size:
-                self.show_info_message(
-                    f"File too large for preview\n"
-                    f"Size: {self.format_file_size(file_size)}\n"
-                    f"Maximum: {self.format_file_size(self.max_preview_size)}"
-                )
-                return
         except Exception as e:
             self.show_error_message(f"Error reading file: {e}")
             return
@@ -201,19 +351,18 @@ Location: {self.file_path.parent}"""
         
         # Determine file type and show appropriate preview
         file_ext = self.file_path.suffix.lower()
-        
-        if file_ext in self.image_extensions:
-            self.preview_image()
-        elif file_ext in self.text_extensions or file_ext in self.code_extensions:
-            self.preview_text()
-        elif file_ext == '.pdf':
-            self.preview_pdf()
-        elif file_ext in self.archive_extensions:
-            self.preview_archive()
-        elif file_ext in self.document_extensions:
-            self.preview_document()
-        else:
-            self.preview_binary()
+        preview = self.PREVIEW_DISPATCH.get(file_ext, 'preview_binary')
+        # The resampling toggle only means something for images
+        self.high_quality_check.configure(state=tk.NORMAL if preview == 'preview_image' else tk.DISABLED)
+        getattr(self, preview)()
+    
+    def reload_image_preview(self):
+        """Re-run just the image load with the new resampling filter"""
+        if self._active_future:
+            self._active_future.cancel()
+        for widget in self.content_frame.winfo_children():
+            widget.destroy()
+        self.preview_image()
     
     def preview_image(self):
         """Preview image files"""
@@ -221,77 +370,140 @@ Location: {self.file_path.parent}"""
             self.show_error_message("PIL/Pillow not available for image preview")
             return
         
+        # BILINEAR is visually the same at preview size and several times faster
+        resample = Image.Resampling.LANCZOS if self.high_quality_var.get() else Image.Resampling.BILINEAR
+        self.load_in_background(self.load_image, self.render_image, "Error loading image",
+                                self.file_path, self.max_image_size, resample)
+
+    @staticmethod
+    def load_image(file_path, max_size, resample):
+        """Decode a preview-sized copy of the image (runs on the worker pool)"""
+        with open(file_path, 'rb') as f:
+            # One sequential read instead of many small seeks (slow on network
+            # shares); big files are mapped so only the pages decoded are read
+            if os.fstat(f.fileno()).st_size <= IMAGE_READ_ALL_BYTES:
+                source = io.BytesIO(f.read())
+                head = source.getbuffer()[:1 << 20].tobytes()
+            else:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                head = source[:1 << 20]
+
+        with source, Image.open(source) as img:
+            # Opening only parses the header; pixels are decoded on first access
+            info = (img.size[0], img.size[1], img.mode, img.format)
+            if img.size[0] <= max_size[0] and img.size[1] <= max_size[1]:
+                img.load()
+                return info, img.copy()
+
+            thumb_path = thumb_cache_path(file_path, head, max_size, img.mode, resample)
+            if thumb_path.exists():
+                with Image.open(thumb_path) as thumb:
+                    thumb.load()
+                    thumb = thumb.copy()
+                try:
+                    os.utime(thumb_path)  # Mark as recently used for prune_thumb_cache
+                except OSError:
+                    pass
+                return info, thumb
+
+            # JPEGs decode at 1/2, 1/4 or 1/8 scale instead of full resolution
+            img.draft("RGB", max_size)
+            img.thumbnail(max_size, resample)
+            thumb = img.copy()
+
+        try:
+            save_thumb(thumb, thumb_path)
+        except (OSError, ValueError):
+            pass  # Cache is best effort
+        return info, thumb
+
+    def render_image(self, result):
+        """Show a decoded image and its info (Tk thread)"""
+        (width, height, mode, format_name), img = result
+
+        # Create info label
+        info_text = f"Dimensions: {width} x {height} pixels\nMode: {mode}\nFormat: {format_name}"
+        info_text += f"\nDecoder: Pillow{'-SIMD' if PIL_SIMD else ''} {PIL_VERSION}"
+        info_label = ttk.Label(self.content_frame, text=info_text, font=("Consolas", 9))
+        info_label.pack(pady=(0, 10))
+
+        # Convert to PhotoImage
+        self.current_image = ImageTk.PhotoImage(img)
+
+        # Display image
+        image_label = ttk.Label(self.content_frame, image=self.current_image)
+        image_label.pack(pady=10)
+
+    def load_in_background(self, load, render, error_prefix, *args):
+        """Run load(*args) on the worker pool, then render(result) on the Tk thread"""
+        self.show_info_message("Loading preview...")
+        if self._active_future:
+            self._active_future.cancel()  # Only succeeds if it has not started yet
+        future = self._pool.submit(load, *args)
+        self._active_future = future
+
+        def on_done(fut):
+            try:
+                self.preview_window.after(0, self._finish_load, fut, render, error_prefix)
+            except (RuntimeError, tk.TclError):
+                pass  # Preview window was closed while loading
+
+        future.add_done_callback(on_done)
+
+    def _finish_load(self, future, render, error_prefix):
+        """Replace the loading message with the loaded preview"""
+        # Ignore loads superseded by a refresh/new file, or a closed window
+        if future is not self._active_future or not self.preview_window.winfo_exists():
+            return
+        for widget in self.content_frame.winfo_children():
+            widget.destroy()
         try:
-            # Open and process image
-            with Image.open(self.file_path) as img:
-                # Get image info
-                width, height = img.size
-                mode = img.mode
-                format_name = img.format
-                
-                # Create info label
-                info_text = f"Dimensions: {width} x {height} pixels\nMode: {mode}\nFormat: {format_name}"
-                info_label = ttk.Label(self.content_frame, text=info_text, font=("Consolas", 9))
-                info_label.pack(pady=(0, 10))
-                
-                # Resize image if too large
-                max_width = 750
-                max_height = 500
-                
-                if width > max_width or height > max_height:
-                    ratio = min(max_width/width, max_height/height)
-                    new_width = int(width * ratio)
-                    new_height = int(height * ratio)
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Convert to PhotoImage
-                self.current_image = ImageTk.PhotoImage(img)
-                
-                # Display image
-                image_label = ttk.Label(self.content_frame, image=self.current_image)
-                image_label.pack(pady=10)
-                
+            render(future.result())
         except Exception as e:
-            self.show_error_message(f"Error loading image: {e}")
+            self.show_error_message(f"{error_prefix}: {e}")
     
     def preview_text(self):
         """Preview text files with syntax highlighting"""
-        try:
-            # Try different encodings
-            encodings = ['utf-8', 'utf-16', 'latin1', 'cp1252']
-            content = None
-            
-            for encoding in encodings:
-                try:
-                    with open(self.file_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if content is None:
-                self.show_error_message("Could not decode text file")
-                return
-            
-            # Create text widget
-            text_widget = ScrolledText(
-                self.content_frame, 
-                height=25, 
-                font=("Consolas", 10),
-                wrap=tk.WORD
-            )
-            text_widget.pack(fill=tk.BOTH, expand=True)
-            
-            # Insert content
-            text_widget.insert("1.0", content)
-            text_widget.config(state="readonly")
-            
-            # Add line numbers for code files
-            if self.file_path.suffix.lower() in self.code_extensions:
-                self.add_line_numbers(text_widget, content)
-                
-        except Exception as e:
-            self.show_error_message(f"Error reading text file: {e}")
+        self.load_in_background(self.load_text, self.render_text, "Error reading text file",
+                                self.file_path, self.max_preview_size)
+
+    @staticmethod
+    def load_text(file_path, max_size):
+        """Read and decode a text file, or both ends of one over max_size (runs on the worker pool)"""
+        if os.path.getsize(file_path) > max_size:
+            head, size, tail = read_head_tail(file_path, TEXT_HEAD_TAIL_BYTES)
+            encoding = detect_encoding(head, final=False)
+            omitted = size - len(head) - len(tail)
+            return (head.decode(encoding, errors='replace')
+                    + f"\n\n… ({omitted:,} bytes omitted) …\n\n"
+                    + tail.decode(encoding, errors='replace'))
+
+        # Read once and decode with an encoding sniffed from the first 64KB
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        encoding = detect_encoding(data[:65536], final=len(data) <= 65536)
+        return data.decode(encoding, errors='replace')
+
+    def render_text(self, content):
+        """Show decoded text (Tk thread)"""
+        is_code = self.file_path.suffix.lower() in self.CODE_EXTENSIONS
+        container = ttk.Frame(self.content_frame)
+        container.pack(fill=tk.BOTH, expand=True)
+
+        # Create text widget; code is not wrapped so gutter rows line up
+        text_widget = ScrolledText(
+            container, 
+            height=25, 
+            font=("Consolas", 10),
+            wrap=tk.NONE if is_code else tk.WORD
+        )
+        
+        # Add line numbers for code files
+        on_page = self.add_line_numbers(container, text_widget) if is_code else None
+        text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        # Insert content
+        self.insert_paged(text_widget, content, on_page)
     
     def preview_pdf(self):
         """Preview PDF files (basic info only)"""
@@ -303,44 +515,58 @@ Location: {self.file_path.parent}"""
     
     def preview_archive(self):
         """Preview archive files by listing contents"""
-        try:
-            import zipfile
-            import tarfile
-            
-            file_ext = self.file_path.suffix.lower()
-            contents = []
-            
-            if file_ext == '.zip':
-                with zipfile.ZipFile(self.file_path, 'r') as zf:
-                    for info in zf.infolist():
-                        size = self.format_file_size(info.file_size)
-                        date = datetime(*info.date_time).strftime("%Y-%m-%d %H:%M")
-                        contents.append(f"{info.filename:<50} {size:>10} {date}")
-            
-            elif file_ext in {'.tar', '.gz', '.bz2'}:
-                with tarfile.open(self.file_path, 'r:*') as tf:
-                    for member in tf.getmembers():
-                        size = self.format_file_size(member.size)
-                        date = datetime.fromtimestamp(member.mtime).strftime("%Y-%m-%d %H:%M")
-                        contents.append(f"{member.name:<50} {size:>10} {date}")
+        self.load_in_background(self.load_archive, self.render_archive, "Error reading archive",
+                                self.file_path)
+
+    def load_archive(self, file_path):
+        """List an archive's entries as formatted lines (runs on the worker pool)"""
+        import zipfile
+        import tarfile
+        
+        file_ext = file_path.suffix.lower()
+        contents = []
+        
+        if file_ext == '.zip':
+            with zipfile.ZipFile(file_path, 'r') as zf:
+                infos = zf.infolist()
+                format_size = self.format_file_size
+                # date_time is already a (Y, M, D, h, m, s) tuple; no datetime needed
+                contents.extend(
+                    f"{info.filename:<50} {format_size(info.file_size):>10} "
+                    f"{info.date_time[0]:04d}-{info.date_time[1]:02d}-{info.date_time[2]:02d} "
+                    f"{info.date_time[3]:02d}:{info.date_time[4]:02d}"
+                    for info in infos[:MAX_ARCHIVE_ENTRIES])
+                if len(infos) > MAX_ARCHIVE_ENTRIES:
+                    contents.append(f"... ({len(infos) - MAX_ARCHIVE_ENTRIES} more entries omitted)")
+        
+        elif file_ext in {'.tar', '.gz', '.bz2'}:
+            # Stream mode reads members in order and can stop early, unlike
+            # getmembers() which scans to the end of the archive first
+            with tarfile.open(file_path, 'r|*') as tf:
+                for member in tf:
+                    if len(contents) == MAX_ARCHIVE_ENTRIES:
+                        contents.append("... (more entries omitted)")
+                        break
+                    size = self.format_file_size(member.size)
+                    date = datetime.fromtimestamp(member.mtime).strftime("%Y-%m-%d %H:%M")
+                    contents.append(f"{member.name:<50} {size:>10} {date}")
+        return contents
+
+    def render_archive(self, contents):
+        """Show an archive listing (Tk thread)"""
+        if contents:
+            # Create text widget to show contents
+            text_widget = ScrolledText(
+                self.content_frame, 
+                height=20, 
+                font=("Consolas", 9)
+            )
+            text_widget.pack(fill=tk.BOTH, expand=True)
             
-            if contents:
-                # Create text widget to show contents
-                text_widget = ScrolledText(
-                    self.content_frame, 
-                    height=20, 
-                    font=("Consolas", 9)
-                )
-                text_widget.pack(fill=tk.BOTH, expand=True)
-                
-                header = f"{'Filename':<50} {'Size':>10} {'Date'}\n" + "="*75 + "\n"
-                text_widget.insert("1.0", header + "\n".join(contents))
-                text_widget.config(state="readonly")
-            else:
-                self.show_info_message("Archive appears to be empty")
-                
-        except Exception as e:
-            self.show_error_message(f"Error reading archive: {e}")
+            header = f"{'Filename':<50} {'Size':>10} {'Date'}\n" + "="*75 + "\n"
+            self.insert_paged(text_widget, header + "\n".join(contents))
+        else:
+            self.show_info_message("Archive appears to be empty")
     
     def preview_document(self):
         """Preview document files (basic info)"""
@@ -353,42 +579,109 @@ Location: {self.file_path.parent}"""
     
     def preview_binary(self):
         """Preview binary files (hex dump)"""
-        try:
-            with open(self.file_path, 'rb') as f:
-                # Read first 1KB for hex preview
-                data = f.read(1024)
-            
-            # Create hex dump
-            hex_lines = []
-            for i in range(0, len(data), 16):
-                chunk = data[i:i+16]
-                hex_part = ' '.join(f'{b:02x}' for b in chunk)
-                ascii_part = ''.join(chr(b) if 32 <= b <= 126 else '.' for b in chunk)
-                hex_lines.append(f"{i:08x}: {hex_part:<48} |{ascii_part}|")
-            
-            # Create text widget
-            text_widget = ScrolledText(
-                self.content_frame, 
-                height=20, 
-                font=("Consolas", 9)
-            )
-            text_widget.pack(fill=tk.BOTH, expand=True)
-            
-            header = "Binary File - Hex Dump (first 1KB)\n" + "="*60 + "\n\n"
-            text_widget.insert("1.0", header + "\n".join(hex_lines))
-            text_widget.config(state="readonly")
-            
-        except Exception as e:
-            self.show_error_message(f"Error reading binary file: {e}")
-    
-    def add_line_numbers(self, text_widget, content):
-        """Add line numbers to text widget"""
-        lines = content.count('\n') + 1
-        line_numbers = '\n'.join(str(i) for i in range(1, lines + 1))
+        self.load_in_background(self.load_hex_dump, self.render_hex_dump, "Error reading binary file",
+                                self.file_path)
+
+    @staticmethod
+    def load_hex_dump(file_path):
+        """Hex dump lines for the first (and, if large, last) HEX_PREVIEW_BYTES (runs on the worker pool)"""
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return [], size
+            # Map the file so only the pages actually sliced are read in
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = _hex_lines(mm[:HEX_PREVIEW_BYTES])
+                if size > 2 * HEX_PREVIEW_BYTES:
+                    tail_start = size - HEX_PREVIEW_BYTES
+                    lines.append(f"… ({tail_start - HEX_PREVIEW_BYTES:,} bytes omitted) …")
+                    lines.extend(_hex_lines(mm[tail_start:], tail_start))
+        return lines, size
+
+    def render_hex_dump(self, result):
+        """Show hex dump lines (Tk thread)"""
+        hex_lines, size = result
+        # Create text widget
+        text_widget = ScrolledText(
+            self.content_frame, 
+            height=20, 
+            font=("Consolas", 9)
+        )
+        text_widget.pack(fill=tk.BOTH, expand=True)
         
-        # This is a simplified version - full implementation would require
-        # a separate text widget for line numbers
-        pass
+        span = "first and last" if size > 2 * HEX_PREVIEW_BYTES else "first"
+        header = f"Binary File - Hex Dump ({span} {self.format_file_size(HEX_PREVIEW_BYTES)})\n" + "="*60 + "\n\n"
+        text_widget.insert("1.0", header + "\n".join(hex_lines))
+        text_widget.text.configure(state="disabled")
+    
+    def insert_paged(self, text_widget, content, on_page=None):
+        """Insert the first page of content now and further pages as the view nears the end.
+
+        on_page, if given, is called after each page is inserted.
+        """
+        text = text_widget.text  # The Text inside the ScrolledText frame
+        position = 0
+
+        def next_page():
+            # About PREVIEW_PAGE_CHARS, cut after a newline when there is one
+            nonlocal position
+            end = position + PREVIEW_PAGE_CHARS
+            if end < len(content):
+                newline = content.rfind('\n', position, end)
+                if newline >= 0:
+                    end = newline + 1
+            page = content[position:end]
+            position = end
+            return page
+
+        text.insert("1.0", next_page())
+        text.mark_set("insert", "1.0")
+        text.configure(state="disabled")
+        if on_page:
+            on_page()
+
+        def page_in():
+            if position >= len(content) or not text.winfo_exists():
+                return
+            if text.yview()[1] > 0.8:
+                text.configure(state="normal")
+                text.insert(END, next_page())
+                text.configure(state="disabled")
+                if on_page:
+                    on_page()
+            text.after(200, page_in)
+
+        page_in()
+
+    def add_line_numbers(self, parent, text_widget):
+        """Add a line-number gutter left of text_widget.
+
+        Returns a callback that numbers any lines inserted since the last call,
+        so only lines actually loaded into the widget get numbers.
+        """
+        text = text_widget.text
+        gutter = tk.Text(parent, width=6, padx=4, font=("Consolas", 10), takefocus=0,
+                         wrap=tk.NONE, state="disabled", cursor="arrow")
+        gutter.pack(side=tk.LEFT, fill=tk.Y)
+
+        # Scrolling the text also scrolls the gutter
+        vbar = text_widget.vbar
+        def on_scroll(first, last):
+            vbar.set(first, last)
+            gutter.yview_moveto(first)
+        text.configure(yscrollcommand=on_scroll)
+
+        numbered = 0
+        def sync_numbers():
+            nonlocal numbered
+            total = int(text.index("end-1c").split(".")[0])
+            if total > numbered:
+                gutter.configure(state="normal")
+                prefix = "\n" if numbered else ""
+                gutter.insert(END, prefix + "\n".join(map(str, range(numbered + 1, total + 1))))
+                gutter.configure(state="disabled")
+                numbered = total
+        return sync_numbers
     
     def show_error_message(self, message):
         """Show error message in preview area"""
@@ -455,6 +748,12 @@ Location: {self.file_path.parent}"""
             self.preview_window.title(f"File Preview - {self.file_path.name}")
             self.load_file_preview()
     
+    def close_preview(self):
+        """Cancel pending loads and close the window"""
+        self._active_future = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.preview_window.destroy()
+
     def copy_file_path(self):
         """Copy file path to clipboard"""
         self.preview_window.clipboard_clear()
@@ -463,12 +762,23 @@ Location: {self.file_path.parent}"""
     
     def on_canvas_configure(self, event):
         """Handle canvas resize"""
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        canvas_width = event.width
-        self.canvas.itemconfig(self.canvas_window, width=canvas_width)
+        self._canvas_width = event.width
+        self._schedule_resize()
     
     def on_frame_configure(self, event):
         """Handle frame resize"""
+        self._schedule_resize()
+
+    def _schedule_resize(self):
+        """Coalesce bursts of <Configure> events into one layout update"""
+        if self._resize_job:
+            self.canvas.after_cancel(self._resize_job)
+        self._resize_job = self.canvas.after(16, self._apply_resize)
+
+    def _apply_resize(self):
+        self._resize_job = None
+        if self._canvas_width is not None:
+            self.canvas.itemconfig(self.canvas_window, width=self._canvas_width)
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
 
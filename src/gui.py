@@ -1,35 +1,44 @@
 import os
 import shutil
-import sqlite3
 import csv
-import json
+import queue
+import threading
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from tkinter import filedialog, Toplevel, END, WORD, BOTH, LEFT, X, RIGHT, Y, messagebox
-from PIL import Image, ImageTk
+from tkinter import filedialog, Toplevel, END, WORD, BOTH, LEFT, X, RIGHT, Y, messagebox, TclError
 import ttkbootstrap as ttk
 from ttkbootstrap.scrolled import ScrolledText
 from ttkbootstrap.widgets import Meter
 from ttkbootstrap.constants import INFO, SUCCESS, PRIMARY, WARNING, SECONDARY, DANGER, LIGHT
 
 from src.organizer import start_processing_threaded, regroup_by_tags, undo_last_cleanup_threaded, DB_PATH
-from src.db import update_tags_in_db
-from src.ai_tagger import get_batched_ai_tags, BATCH_SIZE, SKIP_TAGS
-from src.ai_tagger import set_ai_enabled
+from src.organizer import LOG_Q, queue_log, enhanced_history, undo_session_by_id, ProgressTracker
+from src.db import get_read_conn, get_pending_batches, update_tags_many
+from src import ai_tagger
+from src.ai_tagger import submit_async, tag_all_batches, BATCH_SIZE, SKIP_TAGS
+from src.ai_tagger import set_ai_enabled, set_max_concurrent_batches, submit_retag_batch
 from src.search_window import open_search_window
 from src.index_files import start_indexing_threaded, get_index_statistics, clear_index
 from src.theme_manager import theme_manager
 from src.desktop_watcher import DesktopWatcher
 from src.time_machine_gui import show_time_machine_window
-from src.file_preview import show_file_preview, preview_file_dialog
 import multiprocessing
 
 # Enhanced History Management
 HISTORY_LOG_PATH = Path("history_log.json")
 
+@lru_cache(maxsize=4096)
+def format_timestamp(iso_timestamp, fmt):
+    """strftime an ISO timestamp; session timestamps never change, so cache them"""
+    return datetime.fromisoformat(iso_timestamp).strftime(fmt)
+
 class UndoHistoryManager:
     def __init__(self):
         self.history_path = HISTORY_LOG_PATH
+        # (history version, {limit: session list}) - rebuilt only after a change
+        self._session_lists = (None, {})
 
     def create_new_session(self, session_name=None):
         """Create a new undo session"""
@@ -87,35 +96,35 @@ class UndoHistoryManager:
         self.save_history(history)
 
     def load_history(self):
-        """Load the history log"""
-        if not self.history_path.exists():
-            return []
-        try:
-            with open(self.history_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return []
+        """Load the history log (shared with the organizer's in-memory copy)"""
+        return enhanced_history.load_history()
 
     def save_history(self, history):
         """Save the history log"""
-        with open(self.history_path, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        enhanced_history.save_history(history)
+
+    def get_session_list(self, limit=None):
+        """Get a list of the most recent `limit` sessions (all by default) for display"""
+        version, cached = self._session_lists
+        if version != enhanced_history.version:
+            cached = {}
+            self._session_lists = (enhanced_history.version, cached)
+        if limit in cached:
+            return cached[limit]
 
-    def get_session_list(self):
-        """Get a list of all sessions for display"""
         history = self.load_history()
         session_list = []
-        for session in reversed(history):  # Most recent first
+        for session in islice(reversed(history), limit):  # Most recent first
             action_count = len(session.get("actions", []))
-            timestamp = datetime.fromisoformat(session["timestamp"]).strftime("%Y-%m-%d %H:%M")
+            timestamp = format_timestamp(session["timestamp"], "%Y-%m-%d %H:%M")
             status_emoji = "🔄" if session.get("status") == "active" else "✅"
             display_name = f"{status_emoji} {session['name']} ({action_count} files) - {timestamp}"
             session_list.append((session["id"], display_name, session))
+        cached[limit] = session_list
         return session_list
 
     def undo_session(self, session_id, log_callback=None, meter=None):
         """Undo a specific session - delegates to organizer module"""
-        from src.organizer import undo_session_by_id
         return undo_session_by_id(session_id, log_callback, meter)
 
 # Global history manager
@@ -127,10 +136,29 @@ global_meter = None
 global_desktop_watcher = None
 global_status_label = None
 
+# Activity log drain: at most this many queued lines per tick
+LOG_FLUSH_INTERVAL_MS = 100
+LOG_FLUSH_MAX_LINES = 200
+
+# SKIP_TAGS is a frozenset; sort once so the AI tab shows a stable order
+SKIP_TAGS_DISPLAY = ", ".join(sorted(SKIP_TAGS))
+
+def flush_log_queue(app):
+    """Move queued log lines into the activity log with a single insert"""
+    lines = []
+    append, get = lines.append, LOG_Q.get_nowait  # Bound once for the drain loop
+    try:
+        for _ in range(LOG_FLUSH_MAX_LINES):
+            append(get())
+    except queue.Empty:
+        pass
+    if lines and global_log_area:
+        global_log_area.insert(END, "\n".join(lines) + "\n")
+        global_log_area.see(END)
+    app.after(LOG_FLUSH_INTERVAL_MS, flush_log_queue, app)
+
 def retag_missing_entries_threaded(log_callback, meter):
     """Threaded version of retag_missing_entries"""
-    import threading
-
     def retag_thread():
         try:
             retag_missing_entries(log_callback, meter)
@@ -141,19 +169,48 @@ def retag_missing_entries_threaded(log_callback, meter):
     thread.start()
     return thread
 
+# Untagged rows, or rows carrying a generic media tag. Tags are stored as
+# "a, b, c", so wrapping them in ", " delimiters matches whole tags only.
+# Built once so every call reuses the same SQL text (and sqlite3's cached
+# prepared statement).
+_RETAG_PARAMS = tuple(f"%, {tag}, %" for tag in sorted(SKIP_TAGS))
+_RETAG_QUERY = ("SELECT original_name FROM files WHERE tags IS NULL OR tags = '' OR "
+                + " OR ".join("(', ' || tags || ', ') LIKE ?" for _ in _RETAG_PARAMS))
+
+def get_names_needing_retag():
+    """Return the original names of files that should be retagged"""
+    with get_read_conn() as conn:
+        # Iterate the cursor rather than fetchall() so only the names are kept
+        return [name for (name,) in conn.execute(_RETAG_QUERY, _RETAG_PARAMS)]
+
+def retag_missing_batch_api_threaded(log_callback):
+    """Submit files needing retagging to the OpenAI Batch API in the background"""
+    def batch_thread():
+        try:
+            missing = get_names_needing_retag()
+            if not missing:
+                log_callback("✅ No files need retagging.")
+                return
+            # Don't resubmit names an earlier job is still working on
+            pending = {name for _, names in get_pending_batches() for name in names}
+            missing = [name for name in missing if name not in pending]
+            if not missing:
+                log_callback("⏳ All files needing retagging are already in a pending batch.")
+                return
+            batch_id = submit_retag_batch(missing)
+            log_callback(f"📨 Submitted {len(missing)} files to the Batch API ({batch_id}). "
+                         f"Tags will be applied automatically once the batch completes.")
+            if global_desktop_watcher:
+                global_desktop_watcher.start_batch_polling()
+        except Exception as e:
+            log_callback(f"❌ Error submitting retag batch: {e}")
+
+    thread = threading.Thread(target=batch_thread, daemon=True)
+    thread.start()
+    return thread
+
 def retag_missing_entries(log_callback, meter):
-    import sqlite3
-    import time
-    from src.db import update_tags_in_db
-    from src.ai_tagger import get_batched_ai_tags, BATCH_SIZE, SKIP_TAGS
-    from src.organizer import DB_PATH, ProgressTracker
-
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT original_name, new_path, tags FROM files")
-        rows = c.fetchall()
-
-    missing = [row for row in rows if not row[2] or not set(row[2].split(", ")).isdisjoint(SKIP_TAGS) == False]
+    missing = get_names_needing_retag()
     if not missing:
         log_callback("✅ No files need retagging.")
         return
@@ -162,25 +219,39 @@ def retag_missing_entries(log_callback, meter):
     progress_tracker = ProgressTracker(len(missing), meter, log_callback)
     log_callback(f"🔄 Starting to retag {len(missing)} files...")
 
-    for i in range(0, len(missing), BATCH_SIZE):
-        batch = missing[i:i+BATCH_SIZE]
-        filenames = [row[0] for row in batch]
-
-        log_callback(f"🤖 Processing batch {i//BATCH_SIZE + 1}...")
-        tag_map = get_batched_ai_tags(filenames)
-
-        # Process the entire batch, then update progress once
+    name_batches = [missing[i:i+BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+    log_callback(f"🤖 Sending {len(name_batches)} batch(es) to OpenAI ({ai_tagger.MAX_CONCURRENT_BATCHES} at a time)...")
+    # Batches are written as they come back, so DB writes overlap with the
+    # requests still in flight. None marks the end of the run.
+    finished = queue.Queue()
+    # Skip the pattern cache: it would just hand back the generic tags being replaced
+    future = submit_async(tag_all_batches(name_batches, use_cache=False,
+                                          on_batch=lambda i, tag_map: finished.put((i, tag_map))))
+    future.add_done_callback(lambda _: finished.put(None))
+
+    while True:
+        item = finished.get()
+        if item is None:
+            break
+        index, tag_map = item
+        filenames = name_batches[index]
+        # Process the entire batch, then write its tags in one transaction
+        pairs = []
+        lines = []
         for name in filenames:
             tags = tag_map.get(name.strip().lower(), "")
             if tags:
-                update_tags_in_db(name, tags)
-                log_callback(f"🔁 Retagged: {name} | Tags: {tags}")
+                pairs.append((name, tags))
+                lines.append(f"🔁 Retagged: {name} | Tags: {tags}")
             else:
-                log_callback(f"⚠️ No tags found for: {name}")
+                lines.append(f"⚠️ No tags found for: {name}")
+        update_tags_many(pairs)
+        log_callback("\n".join(lines))
 
         # Update progress once per batch instead of per file
         progress_tracker.update(len(filenames))
 
+    future.result()  # Re-raise anything that stopped the run early
     progress_tracker.finish()
     log_callback("✅ Retagging complete.")
 
@@ -226,7 +297,7 @@ def create_main_content(parent):
         bootstyle=INFO,
         width=18,
         command=lambda: start_indexing_threaded(
-            lambda msg: global_log_area.insert(END, msg + "\n") or global_log_area.see(END) if global_log_area else None,
+            queue_log,
             global_meter
         )
     ).grid(row=1, column=0, padx=2, pady=2)
@@ -237,7 +308,7 @@ def create_main_content(parent):
         bootstyle=WARNING,
         width=18,
         command=lambda: undo_last_cleanup_threaded(
-            lambda msg: global_log_area.insert(END, msg + "\n") or global_log_area.see(END) if global_log_area else None,
+            queue_log,
             global_meter
         )
     ).grid(row=1, column=1, padx=2, pady=2)
@@ -275,9 +346,11 @@ def create_main_content(parent):
             global_status_label.config(text=message)
 
     global_desktop_watcher = DesktopWatcher(
-        log_callback=lambda msg: global_log_area.insert(END, msg + "\n") or global_log_area.see(END) if global_log_area else None,
+        log_callback=queue_log,
         status_callback=update_monitor_status
     )
+    # Apply Batch API jobs left pending by an earlier run (exits at once if none)
+    global_desktop_watcher.start_batch_polling()
 
     # Monitor toggle
     monitor_var = ttk.BooleanVar(value=global_desktop_watcher.get_setting("live_monitor", False))
@@ -369,7 +442,7 @@ def create_main_content(parent):
         text="📊 Export CSV", 
         bootstyle=SECONDARY,
         width=17,
-        command=export_to_csv
+        command=lambda: export_to_csv(tools_btn_frame)
     ).grid(row=0, column=1, padx=2, pady=2, sticky="ew")
 
     ttk.Button(
@@ -408,17 +481,10 @@ def create_main_content(parent):
     ai_tab = create_compact_ai_tab(compact_notebook)
     compact_notebook.add(ai_tab, text="🤖 AI")
 
-    # Analytics Tab (compact)
-    analytics_tab = create_compact_analytics_tab(compact_notebook)
-    compact_notebook.add(analytics_tab, text="📊 Analytics")
-
-    # History Tab (compact)
-    history_tab = create_compact_history_tab(compact_notebook)
-    compact_notebook.add(history_tab, text="📜 History")
-
-    # Settings Tab (compact)
-    settings_tab = create_compact_settings_tab(compact_notebook)
-    compact_notebook.add(settings_tab, text="⚙️ Settings")
+    # Tabs the user hasn't opened yet are built on first view
+    add_lazy_tab(compact_notebook, create_compact_analytics_tab, "📊 Analytics")
+    add_lazy_tab(compact_notebook, create_compact_history_tab, "📜 History")
+    add_lazy_tab(compact_notebook, create_compact_settings_tab, "⚙️ Settings")
 
     # Bottom section - Log area
     log_frame = ttk.LabelFrame(main_container, text="📋 Activity Log", padding=8)
@@ -438,6 +504,17 @@ def create_main_content(parent):
 
     return main_container
 
+def add_lazy_tab(notebook, create_tab, text):
+    """Add a placeholder tab that runs create_tab(placeholder) the first time it is selected"""
+    placeholder = ttk.Frame(notebook)
+    notebook.add(placeholder, text=text)
+
+    def on_tab_changed(event):
+        if notebook.nametowidget(notebook.select()) is placeholder and not placeholder.winfo_children():
+            create_tab(placeholder).pack(fill=BOTH, expand=True)
+
+    notebook.bind("<<NotebookTabChanged>>", on_tab_changed, add="+")
+
 def create_compact_ai_tab(parent):
     """Create compact AI tagging tab"""
     tab_frame = ttk.Frame(parent)
@@ -465,6 +542,21 @@ def create_compact_ai_tab(parent):
     batch_var = ttk.IntVar(value=BATCH_SIZE)
     ttk.Spinbox(batch_frame, from_=1, to=100, width=8, textvariable=batch_var).pack(side=LEFT, padx=5)
 
+    # Max AI requests in flight at once (lower it if OpenAI keeps rate limiting)
+    parallel_frame = ttk.Frame(settings_frame)
+    parallel_frame.pack(fill=X, pady=3)
+    ttk.Label(parallel_frame, text="Parallel:").pack(side=LEFT)
+    parallel_var = ttk.IntVar(value=ai_tagger.MAX_CONCURRENT_BATCHES)
+    ttk.Spinbox(parallel_frame, from_=1, to=16, width=8, textvariable=parallel_var).pack(side=LEFT, padx=5)
+
+    def on_parallel_change(*_):
+        try:
+            set_max_concurrent_batches(parallel_var.get())
+        except (TclError, ValueError):
+            pass  # Half-typed value; keep the previous setting
+
+    parallel_var.trace_add("write", on_parallel_change)
+
     # Center: Actions
     actions_frame = ttk.LabelFrame(ai_container, text="🔄 AI Actions", padding=8)
     actions_frame.pack(side=LEFT, fill=Y, padx=5)
@@ -475,18 +567,27 @@ def create_compact_ai_tab(parent):
         bootstyle=INFO,
         width=15,
         command=lambda: retag_missing_entries_threaded(
-            lambda msg: global_log_area.insert(END, msg + "\n") or global_log_area.see(END) if global_log_area else None, 
+            queue_log,
             global_meter
         )
     ).pack(pady=3)
 
+    ttk.Button(
+        actions_frame, 
+        text="💸 Retag (Batch API, cheaper)", 
+        bootstyle=SECONDARY,
+        command=lambda: retag_missing_batch_api_threaded(
+            queue_log
+        )
+    ).pack(pady=3)
+
     # Right: Skip tags
     skip_frame = ttk.LabelFrame(ai_container, text="🚫 Skip Tags", padding=8)
     skip_frame.pack(side=RIGHT, fill=BOTH, expand=True, padx=(5, 0))
 
     skip_text = ScrolledText(skip_frame, height=6, font=("Consolas", 8))
     skip_text.pack(fill=BOTH, expand=True)
-    skip_text.insert(END, ", ".join(SKIP_TAGS))
+    skip_text.insert(END, SKIP_TAGS_DISPLAY)
 
     return tab_frame
 
@@ -503,34 +604,40 @@ def create_compact_analytics_tab(parent):
 
     def get_file_stats():
         try:
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                c.execute("SELECT COUNT(*) FROM files")
-                total_files = c.fetchone()[0]
-                c.execute("SELECT COUNT(*) FROM files WHERE tags IS NOT NULL AND tags != ''")
-                tagged_files = c.fetchone()[0]
+            # Both counts in one pass over the table
+            with get_read_conn() as conn:
+                total_files, tagged_files = conn.execute(
+                    "SELECT COUNT(*), COUNT(CASE WHEN tags != '' THEN 1 END) FROM files").fetchone()
                 return total_files, tagged_files
         except:
             return 0, 0
 
-    total_files, tagged_files = get_file_stats()
-
-    stats_text = f"""📊 Total: {total_files}
+    def format_file_stats(total_files, tagged_files):
+        return f"""📊 Total: {total_files}
 🏷️ Tagged: {tagged_files}
 📝 Untagged: {total_files - tagged_files}
 📈 Coverage: {(tagged_files/total_files*100) if total_files > 0 else 0:.1f}%"""
 
-    ttk.Label(stats_frame, text=stats_text, font=("Consolas", 9)).pack(anchor="w")
+    stats_label = ttk.Label(stats_frame, text="⏳ Loading...", font=("Consolas", 9))
+    stats_label.pack(anchor="w")
+
+    # Count in the background so a large table doesn't stall window creation
+    def load_file_stats():
+        stats_text = format_file_stats(*get_file_stats())
+        stats_label.after(0, lambda: stats_label.configure(text=stats_text))
+
+    threading.Thread(target=load_file_stats, daemon=True).start()
 
     # Center: Session stats
     session_frame = ttk.LabelFrame(analytics_container, text="⏱️ Sessions", padding=8)
     session_frame.pack(side=LEFT, fill=Y, padx=5)
 
     def get_session_stats():
-        sessions = history_manager.get_session_list()
+        # Counts only - no need to format a display row per session
+        sessions = history_manager.load_history()
         total_sessions = len(sessions)
-        completed_sessions = sum(1 for _, _, data in sessions if data.get("status") == "completed")
-        total_actions = sum(len(data.get("actions", [])) for _, _, data in sessions)
+        completed_sessions = sum(1 for data in sessions if data.get("status") == "completed")
+        total_actions = sum(len(data.get("actions", [])) for data in sessions)
         return total_sessions, completed_sessions, total_actions
 
     total_sessions, completed_sessions, total_actions = get_session_stats()
@@ -548,12 +655,14 @@ def create_compact_analytics_tab(parent):
     activity_text = ScrolledText(activity_frame, height=6, font=("Consolas", 8))
     activity_text.pack(fill=BOTH, expand=True)
 
-    sessions = history_manager.get_session_list()
+    sessions = history_manager.get_session_list(limit=3)
     if sessions:
-        for session_id, display_name, session_data in sessions[:3]:  # Show last 3
-            timestamp = datetime.fromisoformat(session_data["timestamp"]).strftime("%m/%d %H:%M")
+        lines = []
+        for session_id, display_name, session_data in sessions:  # Show last 3
+            timestamp = format_timestamp(session_data["timestamp"], "%m/%d %H:%M")
             file_count = len(session_data.get("actions", []))
-            activity_text.insert(END, f"{timestamp} | {file_count} files\n")
+            lines.append(f"{timestamp} | {file_count} files\n")
+        activity_text.insert(END, "".join(lines))
     else:
         activity_text.insert(END, "No activity yet...")
 
@@ -602,11 +711,10 @@ def create_compact_history_tab(parent):
     ttk.Button(actions_frame, text="🗑️ Clear All", bootstyle=DANGER, width=15).pack(pady=2)
 
     # Populate sessions
-    sessions = history_manager.get_session_list()
-    for session_id, display_name, session_data in sessions[:10]:  # Show last 10
+    for session_id, display_name, session_data in history_manager.get_session_list(limit=10):  # Show last 10
         status = "✅" if session_data.get("status") == "completed" else "🔄"
         file_count = len(session_data.get("actions", []))
-        date_str = datetime.fromisoformat(session_data["timestamp"]).strftime("%m/%d %H:%M")
+        date_str = format_timestamp(session_data["timestamp"], "%m/%d %H:%M")
 
         tree.insert("", "end", values=(status, session_data["name"][:20], file_count, date_str))
 
@@ -885,12 +993,6 @@ def show_theme_preview(theme_display_name):
 
 def show_index_stats():
     """Show index statistics in a popup window"""
-    stats = get_index_statistics()
-
-    if 'error' in stats:
-        messagebox.showerror("Index Error", f"Error getting statistics: {stats['error']}")
-        return
-
     # Create stats window
     stats_win = Toplevel()
     stats_win.title("📊 Index Statistics")
@@ -907,15 +1009,8 @@ def show_index_stats():
     main_stats_frame = ttk.LabelFrame(stats_win, text="📈 Overview", padding=10)
     main_stats_frame.pack(fill=X, padx=20, pady=5)
 
-    total_size_mb = stats['total_size_bytes'] / (1024 * 1024) if stats['total_size_bytes'] else 0
-    total_size_gb = total_size_mb / 1024
-
-    overview_text = f"""📁 Total Files: {stats['total_files']:,}
-✅ Accessible: {stats['accessible_files']:,}
-❌ Inaccessible: {stats['inaccessible_files']:,}
-💾 Total Size: {total_size_gb:.2f} GB"""
-
-    ttk.Label(main_stats_frame, text=overview_text, font=("Consolas", 9)).pack(anchor="w")
+    overview_label = ttk.Label(main_stats_frame, text="⏳ Loading...", font=("Consolas", 9))
+    overview_label.pack(anchor="w")
 
     # File types
     types_frame = ttk.LabelFrame(stats_win, text="📋 Top File Types", padding=10)
@@ -924,18 +1019,54 @@ def show_index_stats():
     types_text = ScrolledText(types_frame, height=10, font=("Consolas", 8))
     types_text.pack(fill=BOTH, expand=True)
 
-    if stats['file_types']:
-        types_text.insert(END, "Type           Count    %\n")
-        types_text.insert(END, "-" * 25 + "\n")
-        for file_type, count in stats['file_types'][:15]:
-            percentage = (count / stats['total_files']) * 100 if stats['total_files'] > 0 else 0
-            display_type = file_type if file_type else "(none)"
-            types_text.insert(END, f"{display_type:<12} {count:>6,} {percentage:>5.1f}%\n")
-
     ttk.Button(stats_win, text="Close", bootstyle=PRIMARY, command=stats_win.destroy).pack(pady=10)
 
+    def show_error(error):
+        stats_win.destroy()
+        messagebox.showerror("Index Error", f"Error getting statistics: {error}")
+
+    def show_stats(overview_text, types_block):
+        overview_label.configure(text=overview_text)
+        types_text.insert(END, types_block)
+
+    def post(callback, *args):
+        try:
+            stats_win.after(0, callback, *args)
+        except TclError:
+            pass  # Window was closed while the query ran
+
+    # Query and format off the Tk thread, then fill the window in one go
+    def compute_stats():
+        stats = get_index_statistics()
+        if 'error' in stats:
+            post(show_error, stats['error'])
+            return
+
+        total_size_mb = stats['total_size_bytes'] / (1024 * 1024) if stats['total_size_bytes'] else 0
+        total_size_gb = total_size_mb / 1024
+
+        overview_text = f"""📁 Total Files: {stats['total_files']:,}
+✅ Accessible: {stats['accessible_files']:,}
+❌ Inaccessible: {stats['inaccessible_files']:,}
+💾 Total Size: {total_size_gb:.2f} GB"""
+
+        lines = []
+        if stats['file_types']:
+            lines.append("Type           Count    %")
+            lines.append("-" * 25)
+            for file_type, count in stats['file_types'][:15]:
+                percentage = (count / stats['total_files']) * 100 if stats['total_files'] > 0 else 0
+                display_type = file_type if file_type else "(none)"
+                lines.append(f"{display_type:<12} {count:>6,} {percentage:>5.1f}%")
+        types_block = "".join(line + "\n" for line in lines)
+
+        post(show_stats, overview_text, types_block)
+
+    threading.Thread(target=compute_stats, daemon=True).start()
+
 # Helper functions
-def export_to_csv():
+def export_to_csv(widget):
+    """Export the files table to CSV on a worker thread, reporting back via widget.after"""
     dest = filedialog.asksaveasfilename(
         defaultextension=".csv", 
         filetypes=[("CSV Files", "*.csv")],
@@ -944,20 +1075,22 @@ def export_to_csv():
     if not dest:
         return
 
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("SELECT * FROM files")
-            rows = c.fetchall()
-
-        with open(dest, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["ID", "Original Name", "New Path", "File Type", "Moved At", "Tags"])
-            writer.writerows(rows)
+    def export_thread():
+        try:
+            # Stream rows straight from the cursor into a buffered file so memory
+            # use stays flat no matter how large the database is
+            with open(dest, 'w', newline='', encoding='utf-8', buffering=1024 * 1024) as f, \
+                    get_read_conn() as conn:
+                writer = csv.writer(f)
+                writer.writerow(["ID", "Original Name", "New Path", "File Type", "Moved At", "Tags"])
+                writer.writerows(conn.execute("SELECT * FROM files"))
+        except Exception as e:
+            error = f"Failed to export database:\n{e}"
+            widget.after(0, lambda: messagebox.showerror("Export Error", error))
+        else:
+            widget.after(0, lambda: messagebox.showinfo("Export Complete", f"Database exported to:\n{dest}"))
 
-        messagebox.showinfo("Export Complete", f"Database exported to:\n{dest}")
-    except Exception as e:
-        messagebox.showerror("Export Error", f"Failed to export database:\n{e}")
+    threading.Thread(target=export_thread, daemon=True).start()
 
 def preview_file():
     from src.file_preview import preview_file_dialog
@@ -1004,6 +1137,7 @@ def build_gui():
         app.destroy()
 
     app.protocol("WM_DELETE_WINDOW", on_closing)
+    app.after(LOG_FLUSH_INTERVAL_MS, flush_log_queue, app)
 
     # Start the application
     app.mainloop()
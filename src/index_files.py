@@ -10,7 +10,7 @@ from queue import Queue
 import multiprocessing
 
 # Import database functions
-from src.db import DB_PATH
+from src.db import DB_PATH, get_conn, get_read_conn
 
 # System folders to skip based on OS
 WINDOWS_SKIP_FOLDERS = {
@@ -392,7 +392,7 @@ def start_indexing_threaded(log_callback, meter, start_paths=None, max_workers=N
 def get_index_statistics():
     """Get statistics about the file index"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_read_conn() as conn:
             c = conn.cursor()
             
             # Total files
@@ -424,10 +424,8 @@ def get_index_statistics():
 def clear_index():
     """Clear the entire file index"""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            c = conn.cursor()
-            c.execute("DELETE FROM file_index")
-            conn.commit()
+        with get_conn() as conn:
+            conn.execute("DELETE FROM file_index")
         return True
     except Exception as e:
         return False, str(e)
\ No newline at end of file
@@ -1,19 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import atexit
+import errno
 import json
 import shutil
 import sqlite3
 import os 
+import queue
 import ctypes.wintypes
 from pathlib import Path
-from src.ai_tagger import get_batched_ai_tags
-from src.db import delete_file_record # this is used to delete records from the database
+from src import ai_tagger
+from src.ai_tagger import submit_async, tag_all_batches
+from src.db import delete_file_record, insert_many, update_paths_many # delete_file_record is used to delete records from the database
 import time
 import threading
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 with open("config.json", "r", encoding="utf-8") as f:
     CONFIG = json.load(f)
 
 ALLOWED_EXTENSIONS = CONFIG["ALLOWED_EXTENSIONS"]
+# Inverted once at import so get_category is a single dict lookup
+EXT_TO_CATEGORY = {ext.lower(): category
+                   for category, ext_list in ALLOWED_EXTENSIONS.items()
+                   for ext in ext_list}
+
+# Log lines from worker threads. The GUI drains this in batches (see
+# gui.flush_log_queue) instead of scheduling one Tk callback per line.
+LOG_Q = queue.Queue()
+
+def queue_log(msg):
+    """Thread-safe log callback: queue a line for the activity log"""
+    LOG_Q.put(msg)
 
 # get desktop path - cross-platform compatible
 def get_desktop_path():
@@ -57,8 +80,8 @@ def get_organized_path():
         organized_path.mkdir(exist_ok=True)
         return organized_path
 
-SKIP_TAGS = {"image", "video", "audio"}
 BATCH_SIZE = 50
+MOVE_WORKERS = min(8, (os.cpu_count() or 1) * 2)
 
 USER = os.getenv("USER", os.getenv("USERNAME", "user"))
 DESKTOP = get_desktop_path()
@@ -67,6 +90,8 @@ DB_PATH = Path("file_index.db")
 
 # Enhanced History Management Integration
 HISTORY_LOG_PATH = Path("history_log.json")
+# Actions recorded since the last snapshot, one JSON object per line
+HISTORY_JOURNAL_PATH = Path("history_log.jsonl")
 LEGACY_UNDO_LOG_PATH = Path("undo_log.json")  # For backward compatibility
 
 class EnhancedHistoryManager:
@@ -74,7 +99,13 @@ class EnhancedHistoryManager:
     
     def __init__(self):
         self.history_path = HISTORY_LOG_PATH
+        self.journal_path = HISTORY_JOURNAL_PATH
         self.current_session_id = None
+        self._history = None  # In-memory copy of the snapshot plus journal
+        self._current_session = None  # Dict for current_session_id, found once
+        self._journal = None  # Append handle kept open between actions
+        self.version = 0  # Bumped on every change so readers can cache derived views
+        self._lock = threading.RLock()
         self._migrate_legacy_log()
     
     def _migrate_legacy_log(self):
@@ -107,27 +138,29 @@ class EnhancedHistoryManager:
         if not session_name:
             session_name = f"Organize_{datetime.now().strftime('%m%d_%H%M')}"
         
-        history = self.load_history()
-        
-        # Complete any active sessions first
-        for session in history:
-            if session.get("status") == "active":
-                session["status"] = "completed"
-                session["completed_at"] = datetime.now().isoformat()
-        
-        new_session = {
-            "id": max([s.get("id", 0) for s in history], default=0) + 1,
-            "name": session_name,
-            "timestamp": datetime.now().isoformat(),
-            "actions": [],
-            "status": "active",
-            "files_processed": 0,
-            "files_total": 0
-        }
-        
-        history.append(new_session)
-        self.save_history(history)
-        self.current_session_id = new_session["id"]
+        with self._lock:
+            history = self._load()
+            
+            # Complete any active sessions first
+            for session in history:
+                if session.get("status") == "active":
+                    session["status"] = "completed"
+                    session["completed_at"] = datetime.now().isoformat()
+            
+            new_session = {
+                "id": max([s.get("id", 0) for s in history], default=0) + 1,
+                "name": session_name,
+                "timestamp": datetime.now().isoformat(),
+                "actions": [],
+                "status": "active",
+                "files_processed": 0,
+                "files_total": 0
+            }
+            
+            history.append(new_session)
+            self._save()
+            self.current_session_id = new_session["id"]
+            self._current_session = new_session
         
         if log_callback:
             log_callback(f"📝 Started new session: {session_name}")
@@ -136,79 +169,156 @@ class EnhancedHistoryManager:
     
     def add_action(self, original_path, new_path):
         """Add an action to the current session"""
-        if not self.current_session_id:
-            self.start_new_session()
-        
-        history = self.load_history()
-        current_session = None
-        
-        for session in history:
-            if session["id"] == self.current_session_id:
-                current_session = session
-                break
-        
-        if current_session:
-            current_session["actions"].append({
-                "original": str(original_path),
-                "new": str(new_path),
-                "timestamp": datetime.now().isoformat()
-            })
-            current_session["files_processed"] = len(current_session["actions"])
-            self.save_history(history)
+        with self._lock:
+            if not self.current_session_id:
+                self.start_new_session()
+            current_session = self._get_current_session()
+            if current_session:
+                action = {
+                    "original": str(original_path),
+                    "new": str(new_path),
+                    "timestamp": datetime.now().isoformat()
+                }
+                # Append one journal line instead of rewriting the whole history;
+                # the snapshot is rewritten when the session completes
+                entry = {"session": self.current_session_id, "index": len(current_session["actions"]), **action}
+                line = orjson.dumps(entry).decode() if ORJSON_AVAILABLE else json.dumps(entry, ensure_ascii=False)
+                if self._journal is None:
+                    self._journal = open(self.journal_path, "a", encoding="utf-8")
+                self._journal.write(line + "\n")
+                self._journal.flush()  # Hand the line to the OS so a crash can't lose it
+                current_session["actions"].append(action)
+                current_session["files_processed"] = len(current_session["actions"])
+                self.version += 1
     
     def update_session_total(self, total_files):
         """Update the total files count for the current session"""
-        if not self.current_session_id:
-            return
-        
-        history = self.load_history()
-        for session in history:
-            if session["id"] == self.current_session_id:
-                session["files_total"] = total_files
-                break
-        self.save_history(history)
+        with self._lock:
+            if not self.current_session_id:
+                return
+            
+            current_session = self._get_current_session()
+            if current_session:
+                current_session["files_total"] = total_files
+            self._save()
     
     def complete_current_session(self, log_callback=None):
         """Complete the current session"""
-        if not self.current_session_id:
-            return
-        
-        history = self.load_history()
-        for session in history:
-            if session["id"] == self.current_session_id:
+        with self._lock:
+            if not self.current_session_id:
+                return
+            
+            session = self._get_current_session()
+            if session:
                 session["status"] = "completed"
                 session["completed_at"] = datetime.now().isoformat()
-                if log_callback:
-                    files_count = len(session.get("actions", []))
-                    log_callback(f"✅ Session '{session['name']}' completed with {files_count} files processed")
-                break
+                files_count = len(session.get("actions", []))
+            
+            self._save()
+            self.current_session_id = None
+            self._current_session = None
         
-        self.save_history(history)
-        self.current_session_id = None
+        if session and log_callback:
+            log_callback(f"✅ Session '{session['name']}' completed with {files_count} files processed")
+    
+    def update_session(self, session_id, **fields):
+        """Set fields on one session in place and save, without a load/save round trip"""
+        with self._lock:
+            for session in self._load():
+                if session["id"] == session_id:
+                    session.update(fields)
+                    self._save()
+                    return True
+            return False
+    
+    def _get_current_session(self):
+        """Return the current session dict, scanning the history only on a miss"""
+        with self._lock:
+            session = self._current_session
+            if session is None or session.get("id") != self.current_session_id:
+                session = next((s for s in reversed(self._load())
+                                if s["id"] == self.current_session_id), None)
+                self._current_session = session
+            return session
     
     def load_history(self):
-        """Load the history log"""
+        """Return a copy of the history that callers may modify and pass to save_history"""
+        with self._lock:
+            return [{**session, "actions": list(session.get("actions", []))}
+                    for session in self._load()]
+    
+    def _load(self):
+        """Return the live history (caller holds the lock), reading the files only once"""
+        if self._history is None:
+            self._history = self._read_snapshot()
+            self._replay_journal(self._history)
+        return self._history
+    
+    def _read_snapshot(self):
         if not self.history_path.exists():
             return []
         try:
+            if ORJSON_AVAILABLE:
+                return orjson.loads(self.history_path.read_bytes())
             with open(self.history_path, "r", encoding="utf-8") as f:
                 return json.load(f)
         except Exception:
             return []
     
+    def _replay_journal(self, history):
+        """Re-apply actions journaled after the last snapshot (e.g. after a crash)"""
+        if not self.journal_path.exists():
+            return
+        sessions = {session["id"]: session for session in history}
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    continue  # Torn last line from an interrupted write
+                session = sessions.get(entry.pop("session", None))
+                # "index" skips actions the snapshot already contains
+                if session is not None and entry.pop("index", None) == len(session["actions"]):
+                    session["actions"].append(entry)
+                    session["files_processed"] = len(session["actions"])
+    
     def save_history(self, history):
-        """Save the history log"""
-        with open(self.history_path, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        """Replace the history with `history` and write it out"""
+        with self._lock:
+            if history is not self._history:
+                self._current_session = None  # Points into the replaced list
+            self._history = history
+            self._save()
+    
+    def _save(self):
+        """Write a compacted snapshot of the live history and clear the journal"""
+        with self._lock:
+            tmp_path = self.history_path.with_suffix(".json.tmp")
+            if ORJSON_AVAILABLE:
+                tmp_path.write_bytes(orjson.dumps(self._history))
+            else:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._history, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.history_path)
+            self.close_journal()
+            self.journal_path.unlink(missing_ok=True)
+            self.version += 1
+
+    def close_journal(self):
+        """Flush and close the journal; the next action reopens it"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
 
 # Global history manager instance
 enhanced_history = EnhancedHistoryManager()
+# Buffered journal lines reach disk even if the app exits mid-session
+atexit.register(enhanced_history.close_journal)
 
 def get_category(extension):
-    for category, ext_list in ALLOWED_EXTENSIONS.items():
-        if extension.lower() in ext_list:
-            return category
-    return None
+    return EXT_TO_CATEGORY.get(extension.lower())
 
 class ProgressTracker:
     def __init__(self, total_files, meter=None, log_callback=None):
@@ -218,7 +328,10 @@ class ProgressTracker:
         self.meter = meter
         self.log_callback = log_callback
         self.last_update_time = 0
-        self.update_interval = 0.5  # Update every 500ms instead of every file
+        self.update_interval = 0.1  # At most ~10 meter redraws per second
+        self._pending_ui = None  # Latest {amountused, subtext} not yet drawn
+        self._ui_scheduled = False
+        self._ui_lock = threading.Lock()  # Workers post while the Tk thread applies
         
         if self.meter:
             self.meter.configure(amounttotal=total_files, amountused=0)
@@ -227,14 +340,13 @@ class ProgressTracker:
         self.processed_files += increment
         current_time = time.time()
         
-        # Only update GUI every 500ms to reduce overhead
+        # Only update GUI every update_interval to reduce overhead
         if current_time - self.last_update_time >= self.update_interval:
             self.last_update_time = current_time
             elapsed_time = current_time - self.start_time
             
             if self.meter:
-                # Schedule meter update on main thread
-                self.meter.after(0, lambda: self.meter.configure(amountused=self.processed_files))
+                self._post_ui(amountused=self.processed_files)
             
             # Calculate ETA and speed only during updates
             if self.processed_files > 0 and elapsed_time > 0:
@@ -253,59 +365,114 @@ class ProgressTracker:
                 # Update meter subtitle with progress info
                 if self.meter:
                     progress_text = f"Progress: {self.processed_files}/{self.total_files} | Speed: {speed:.1f}/s | ETA: {eta_str}"
-                    self.meter.after(0, lambda: self.meter.configure(subtext=progress_text))
+                    self._post_ui(subtext=progress_text)
+    
+    def _post_ui(self, **options):
+        """Merge meter options and schedule one redraw for all of them"""
+        with self._ui_lock:
+            if self._pending_ui is None:
+                self._pending_ui = {}
+            self._pending_ui.update(options)
+            if self._ui_scheduled:
+                return
+            self._ui_scheduled = True
+        self.meter.after_idle(self._apply_ui)
+    
+    def _apply_ui(self):
+        """Runs on the Tk thread: draw whatever is pending in one configure"""
+        with self._ui_lock:
+            self._ui_scheduled = False
+            options, self._pending_ui = self._pending_ui, None
+        if options:
+            self.meter.configure(**options)
     
     def finish(self):
         elapsed_time = time.time() - self.start_time
         if self.log_callback:
             self.log_callback(f"✅ Processing complete! Total time: {elapsed_time:.1f}s")
         if self.meter:
-            self.meter.after(0, lambda: self.meter.configure(subtext="Complete!"))
-
-def process_batch(file_paths, tag_map, log_callback, progress_tracker=None):
-    """Process files in batches for better performance"""
-    for file_path in file_paths:
-        if file_path.is_dir():
-            dest_folder = ORGANIZED / "Misc" / "Folders" / file_path.name
-            try:
-                dest_folder.mkdir(parents=True, exist_ok=True)
-                shutil.move(str(file_path), str(dest_folder))
-                
-                # Log to enhanced history
-                enhanced_history.add_action(file_path, dest_folder / file_path.name)
-                
-                from src.db import insert_into_db
-                insert_into_db(file_path.name, str(dest_folder), "folder", "")
-                log_callback(f"📁 Folder moved: {file_path.name} → Misc/Folders/")
-            except Exception as e:
-                log_callback(f"❌ Error moving folder {file_path.name}: {e}")
-            continue
-
-        if file_path.suffix.lower() == '.lnk':
-            log_callback(f"⏭️ Skipped shortcut: {file_path.name}")
-            continue
+            self._post_ui(amountused=self.processed_files, subtext="Complete!")
 
-        category = get_category(file_path.suffix)
-        if category:
-            dest_folder = ORGANIZED / category
-        else:
-            dest_folder = ORGANIZED / "Misc" / "Other"
+def move_path(src, dst):
+    """Move src to dst with a single atomic rename, copying only across devices"""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
 
-        dest_folder.mkdir(parents=True, exist_ok=True)
-        new_path = dest_folder / file_path.name
+def ensure_dir(folder, created_dirs):
+    """mkdir -p, skipped for folders already created during this run"""
+    if folder not in created_dirs:
+        folder.mkdir(parents=True, exist_ok=True)
+        created_dirs.add(folder)
 
+def _move_one(file_path, is_dir, tag_map, created_dirs):
+    """Move one desktop entry; returns ((src, dst, db_row) or None, log message)"""
+    if is_dir:
+        dest_folder = ORGANIZED / "Misc" / "Folders" / file_path.name
         try:
-            shutil.move(str(file_path), str(new_path))
-            
-            # Log to enhanced history instead of legacy system
-            enhanced_history.add_action(file_path, new_path)
-            
-            tags = tag_map.get(file_path.name.strip().lower(), "")
-            from src.db import insert_into_db
-            insert_into_db(file_path.name, str(new_path), file_path.suffix or "unknown", tags)
-            log_callback(f"📄 Moved: {file_path.name} → {dest_folder.name} | Tags: {tags}")
+            ensure_dir(dest_folder, created_dirs)
+            move_path(str(file_path), str(dest_folder / file_path.name))
         except Exception as e:
-            log_callback(f"❌ Error moving {file_path.name}: {e}")
+            return None, f"❌ Error moving folder {file_path.name}: {e}"
+        return ((file_path, dest_folder / file_path.name, (file_path.name, str(dest_folder), "folder", "")),
+                f"📁 Folder moved: {file_path.name} → Misc/Folders/")
+
+    if file_path.suffix.lower() == '.lnk':
+        return None, f"⏭️ Skipped shortcut: {file_path.name}"
+
+    category = get_category(file_path.suffix)
+    if category:
+        dest_folder = ORGANIZED / category
+    else:
+        dest_folder = ORGANIZED / "Misc" / "Other"
+
+    new_path = dest_folder / file_path.name
+
+    try:
+        ensure_dir(dest_folder, created_dirs)
+        move_path(str(file_path), str(new_path))
+    except Exception as e:
+        return None, f"❌ Error moving {file_path.name}: {e}"
+
+    tags = tag_map.get(file_path.name.strip().lower(), "")
+    return ((file_path, new_path, (file_path.name, str(new_path), file_path.suffix or "unknown", tags)),
+            f"📄 Moved: {file_path.name} → {dest_folder.name} | Tags: {tags}")
+
+def process_batch(file_paths, tag_map, log_callback, progress_tracker=None, created_dirs=None, is_dir_map=None):
+    """Process files in batches for better performance"""
+    if created_dirs is None:
+        created_dirs = set()
+    pending = []  # DB rows, flushed with a single insert_many per batch
+    messages = []  # Per-file log lines, sent as one message per batch
+
+    # Moves are mostly kernel I/O, so a small pool overlaps them. History and
+    # DB bookkeeping stay on this thread.
+    with ThreadPoolExecutor(max_workers=MOVE_WORKERS) as executor:
+        futures = []
+        for file_path in file_paths:
+            # is_dir_map holds DirEntry results from the scan, saving a stat per file
+            is_dir = is_dir_map[file_path.name] if is_dir_map is not None else file_path.is_dir()
+            futures.append(executor.submit(_move_one, file_path, is_dir, tag_map, created_dirs))
+
+        # Collect in submission order so history, DB rows and log lines follow
+        # desktop order; the moves themselves still overlap
+        for future in futures:
+            moved, message = future.result()
+            if moved:
+                src, dst, row = moved
+                enhanced_history.add_action(src, dst)
+                pending.append(row)
+            messages.append(message)
+
+    if messages:
+        log_callback("\n".join(messages))
+    try:
+        insert_many(pending)
+    except Exception as e:
+        log_callback(f"❌ Error saving batch to database: {e}")
     
     # Update progress once per batch instead of per file
     if progress_tracker:
@@ -325,24 +492,28 @@ def regroup_by_tags():
     session_id = enhanced_history.start_new_session("Regroup_by_Tags")
     enhanced_history.update_session_total(len([f for f in files_to_regroup if f[2]]))
     
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        for name, path, tags in files_to_regroup:
-            if not tags:
-                continue
-            tag = tags.split(", ")[0]
-            new_folder = ORGANIZED / "GroupedByTag" / tag
-            new_folder.mkdir(parents=True, exist_ok=True)
-            new_path = new_folder / Path(path).name
-            try:
-                if Path(path).exists():
-                    # Log to history before moving
-                    enhanced_history.add_action(Path(path), new_path)
-                    shutil.move(path, new_path)
-                    c.execute("UPDATE files SET new_path = ? WHERE original_name = ?", (str(new_path), name))
-            except Exception as e:
-                print(f"Error regrouping {name}: {e}")
-        conn.commit()
+    # Group moves by destination folder so each folder is created once
+    tagged = sorted(((tags.split(", ")[0], name, path) for name, path, tags in files_to_regroup if tags),
+                    key=lambda row: row[0])
+    updates = []
+    created_dirs = set()
+    for tag, name, path in tagged:
+        new_folder = ORGANIZED / "GroupedByTag" / tag
+        new_path = new_folder / Path(path).name
+        try:
+            if Path(path).exists():
+                ensure_dir(new_folder, created_dirs)
+                # Log to history before moving
+                enhanced_history.add_action(Path(path), new_path)
+                move_path(path, str(new_path))
+                updates.append((name, str(new_path)))
+        except Exception as e:
+            print(f"Error regrouping {name}: {e}")
+
+    try:
+        update_paths_many(updates)
+    except Exception as e:
+        print(f"Error saving regrouped paths: {e}")
     
     enhanced_history.complete_current_session()
 
@@ -352,11 +523,7 @@ def start_processing_threaded(log_area, meter=None):
         try:
             start_processing(log_area, meter)
         except Exception as e:
-            def log_error():
-                log_area.insert("end", f"❌ Error during processing: {e}\n")
-                log_area.see("end")
-            # Schedule the GUI update on the main thread
-            log_area.after(0, log_error)
+            queue_log(f"❌ Error during processing: {e}")
     
     thread = threading.Thread(target=processing_thread, daemon=True)
     thread.start()
@@ -364,14 +531,13 @@ def start_processing_threaded(log_area, meter=None):
 
 def start_processing(log_area, meter=None):
     """Enhanced start processing with session management"""
-    all_files = [f for f in DESKTOP.iterdir() if f.name != "Organized"]
+    # One scandir pass; DirEntry caches the file type so no extra stat per entry
+    with os.scandir(DESKTOP) as entries:
+        is_dir_map = {e.name: e.is_dir(follow_symlinks=False) for e in entries if e.name != "Organized"}
+    all_files = [DESKTOP / name for name in is_dir_map]
 
     def log_callback(msg):
-        def update_log():
-            log_area.insert("end", f"{msg}\n")
-            log_area.see("end")
-        # Schedule GUI updates on the main thread
-        log_area.after(0, update_log)
+        queue_log(msg)
         print(msg)
 
     if not all_files:
@@ -389,18 +555,31 @@ def start_processing(log_area, meter=None):
     log_callback(f"🚀 Starting to process {len(all_files)} files...")
 
     try:
-        for i in range(0, len(all_files), BATCH_SIZE):
-            batch = all_files[i:i+BATCH_SIZE]
-            file_names = [f.name for f in batch if not f.is_dir() and f.suffix.lower() != '.lnk']
-
-            if file_names:  # Only call AI tagging if there are actual files to tag
-                log_callback(f"🤖 Sending batch of {len(file_names)} files to OpenAI...")
-                tag_map = get_batched_ai_tags(file_names)
-                log_callback("✨ Tagging complete. Applying results...\n")
-            else:
-                tag_map = {}
+        batches = [all_files[i:i+BATCH_SIZE] for i in range(0, len(all_files), BATCH_SIZE)]
+        # Only files get AI tags - folders and shortcuts are skipped
+        name_batches = [[f.name for f in batch if not is_dir_map[f.name] and f.suffix.lower() != '.lnk']
+                        for batch in batches]
 
-            process_batch(batch, tag_map, log_callback, progress_tracker)
+        taggable = sum(1 for names in name_batches if names)
+        if taggable:
+            log_callback(f"🤖 Sending {taggable} batch(es) to OpenAI ({ai_tagger.MAX_CONCURRENT_BATCHES} at a time)...")
+        # Each batch is moved as soon as its tags are back, so the meter and log
+        # advance during tagging and one slow request doesn't hold up the rest.
+        # None marks the end of the run.
+        finished = queue.Queue()
+        future = submit_async(tag_all_batches(name_batches, on_batch=lambda i, tag_map: finished.put((i, tag_map))))
+        future.add_done_callback(lambda _: finished.put(None))
+
+        created_dirs = set()
+        while True:
+            item = finished.get()
+            if item is None:
+                break
+            index, tag_map = item
+            process_batch(batches[index], tag_map, log_callback, progress_tracker, created_dirs, is_dir_map)
+        future.result()  # Re-raise anything that stopped tagging early
+        if taggable:
+            log_callback("✨ Tagging complete.")
         
         progress_tracker.finish()
         enhanced_history.complete_current_session(log_callback)
@@ -408,14 +587,8 @@ def start_processing(log_area, meter=None):
     except Exception as e:
         log_callback(f"❌ Error during processing: {e}")
         # Mark session as failed
-        history = enhanced_history.load_history()
-        for session in history:
-            if session["id"] == session_id:
-                session["status"] = "failed"
-                session["error"] = str(e)
-                session["failed_at"] = datetime.now().isoformat()
-                break
-        enhanced_history.save_history(history)
+        enhanced_history.update_session(
+            session_id, status="failed", error=str(e), failed_at=datetime.now().isoformat())
 
 # Legacy compatibility functions
 def log_undo_action(original_path, new_path):
@@ -471,6 +644,7 @@ def undo_session_by_id(session_id, log_callback=None, meter=None):
     
     for i in range(0, len(actions), batch_size):
         batch = actions[i:i+batch_size]
+        lines = []  # One log message per batch instead of one per file
         
         for entry in reversed(batch):  # Undo in reverse order
             original = Path(entry["original"])
@@ -482,23 +656,22 @@ def undo_session_by_id(session_id, log_callback=None, meter=None):
                     # Remove from database
                     delete_file_record(original.name)
                     success_count += 1
-                    if log_callback:
-                        log_callback(f"↩️ Restored: {moved.name} → {original}")
+                    lines.append(f"↩️ Restored: {moved.name} → {original}")
                 else:
-                    if log_callback:
-                        log_callback(f"⚠️ File not found: {moved}")
+                    lines.append(f"⚠️ File not found: {moved}")
             except Exception as e:
-                if log_callback:
-                    log_callback(f"❌ Could not restore {moved.name}: {e}")
+                lines.append(f"❌ Could not restore {moved.name}: {e}")
+        
+        if log_callback and lines:
+            log_callback("\n".join(lines))
         
         # Update progress
         if progress_tracker:
             progress_tracker.update(len(batch))
     
     # Mark session as undone
-    target_session["status"] = "undone"
-    target_session["undone_at"] = datetime.now().isoformat()
-    enhanced_history.save_history(history)
+    enhanced_history.update_session(
+        session_id, status="undone", undone_at=datetime.now().isoformat())
     
     if log_callback:
         log_callback(f"✅ Session undo complete. {success_count}/{len(actions)} files restored.")
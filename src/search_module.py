@@ -189,6 +189,53 @@ class FileSearcher:
             print(f"Search error: {e}")
             return []
 
+    def search_fts(self, query: str, limit: int = 200) -> List[SearchResult]:
+        """
+        Full-text search across file names and tags, best matches first
+
+        Every word in the query is matched as a prefix ("inv" finds "invoice").
+        Falls back to a LIKE scan if the FTS5 index is unavailable.
+
+        Args:
+            query: Free-text search query
+            limit: Maximum number of results to return
+
+        Returns:
+            List of SearchResult objects ranked by BM25
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                c = conn.cursor()
+                try:
+                    c.execute("""SELECT f.* FROM files f
+                                 JOIN files_fts ON f.id = files_fts.rowid
+                                 WHERE files_fts MATCH ?
+                                 ORDER BY bm25(files_fts) LIMIT ?""", (match, limit))
+                except sqlite3.OperationalError:
+                    like = f"%{query.lower()}%"
+                    c.execute("""SELECT * FROM files
+                                 WHERE LOWER(original_name) LIKE ? OR LOWER(tags) LIKE ?
+                                 ORDER BY moved_at DESC LIMIT ?""", (like, like, limit))
+                rows = c.fetchall()
+
+                return [SearchResult(
+                    id=row[0],
+                    original_name=row[1],
+                    new_path=row[2],
+                    file_type=row[3],
+                    moved_at=row[4],
+                    tags=row[5] or ""
+                ) for row in rows]
+
+        except Exception as e:
+            print(f"Full-text search error: {e}")
+            return []
+
     def search_file_index(self,
                          name_pattern: str = "",
                          file_type: str = "",
@@ -537,23 +584,18 @@ class FileSearcher:
         Returns:
             Dictionary with search results from both tables
         """
+        organized_results = self.search_fts(query)
+        indexed_results = []
         if search_index:
-            return self.search_both_tables(
-                name_pattern=query,
-                exact_match=False,
-                case_sensitive=False
-            )
-        else:
-            organized_results = self.search_files(
+            indexed_results = self.search_file_index(
                 name_pattern=query,
-                tags_pattern=query,
                 exact_match=False,
                 case_sensitive=False
             )
-            return {
-                'organized': organized_results,
-                'indexed': []
-            }
+        return {
+            'organized': organized_results,
+            'indexed': indexed_results
+        }
 
     def search_by_size(self, 
                       min_size: Optional[int] = None,
@@ -73,30 +73,30 @@ def open_search_window():
     basic_controls_frame = ttk.LabelFrame(basic_tab, text="Search Criteria", padding=15)
     basic_controls_frame.pack(fill="x", padx=10, pady=10)
     
-    # # Quick search
-    # quick_frame = ttk.Frame(basic_controls_frame)
-    # quick_frame.pack(fill="x", pady=5)
-    # ttk.Label(quick_frame, text="Quick Search:", width=15).pack(side="left")
-    # quick_entry = ttk.Entry(quick_frame, width=40)
-    # quick_entry.pack(side="left", padx=5)
-    
-    # def quick_search():
-    #     query = quick_entry.get().strip()
-    #     if not query:
-    #         messagebox.showwarning("Empty Query", "Please enter a search term.")
-    #         return
-        
-    #     update_status("Searching...")
-    #     results = searcher.quick_search(query)
-    #     display_results(results)
-    #     update_status(f"Found {len(results)} files")
-    
-    # ttk.Button(
-    #     quick_frame, 
-    #     text="🚀 Quick Search", 
-    #     bootstyle=SUCCESS,
-    #     command=quick_search
-    # ).pack(side="left", padx=5)
+    # Quick search (full-text over names and tags)
+    quick_frame = ttk.Frame(basic_controls_frame)
+    quick_frame.pack(fill="x", pady=5)
+    ttk.Label(quick_frame, text="Quick Search:", width=15).pack(side="left")
+    quick_entry = ttk.Entry(quick_frame, width=40)
+    quick_entry.pack(side="left", padx=5)
+    
+    def quick_search():
+        query = quick_entry.get().strip()
+        if not query:
+            messagebox.showwarning("Empty Query", "Please enter a search term.")
+            return
+        
+        update_status("Searching...")
+        results = searcher.quick_search(query)
+        display_combined_results(results)
+        update_status(f"Found {len(results['organized']) + len(results['indexed'])} files")
+    
+    ttk.Button(
+        quick_frame, 
+        text="🚀 Quick Search", 
+        bootstyle=SUCCESS,
+        command=quick_search
+    ).pack(side="left", padx=5)
     
     # File name search
     name_frame = ttk.Frame(basic_controls_frame)
@@ -238,25 +238,23 @@ def open_search_window():
     tags_text.pack(fill="both", expand=True)
     
     if all_tags:
-        tags_text.insert("1.0", "Click on any tag to search:\n\n")
+        # Build (text, tags) pairs and insert them in one call; every tag shares
+        # one "clickable" style and binding, and tag_<i> says which one was hit
+        chunks = ["Click on any tag to search:\n\n", ()]
         for i, tag in enumerate(all_tags):
             if i > 0 and i % 8 == 0:  # New line every 8 tags
-                tags_text.insert("end", "\n")
-            
-            # Create clickable tag
-            start_pos = tags_text.index("end-1c")
-            tags_text.insert("end", f"[{tag}] ")
-            end_pos = tags_text.index("end-1c")
-            
-            # Make tag clickable
-            tag_name = f"tag_{i}"
-            tags_text.tag_add(tag_name, start_pos, end_pos)
-            tags_text.tag_config(tag_name, foreground="blue", underline=True)
-            
-            def make_tag_click_handler(t):
-                return lambda e: search_by_tag(t)
-            
-            tags_text.tag_bind(tag_name, "<Button-1>", make_tag_click_handler(tag))
+                chunks += ["\n", ()]
+            chunks += [f"[{tag}] ", ("clickable", f"tag_{i}")]
+        tags_text.insert("1.0", *chunks)
+        tags_text.tag_config("clickable", foreground="blue", underline=True)
+        
+        def on_tag_click(event):
+            for tag_name in tags_text.tag_names("current"):
+                if tag_name.startswith("tag_"):
+                    search_by_tag(all_tags[int(tag_name[4:])])
+                    break
+        
+        tags_text.tag_bind("clickable", "<Button-1>", on_tag_click)
     else:
         tags_text.insert("1.0", "No tags found in database. Files need to be tagged first.")
     
@@ -767,7 +765,7 @@ TOP ORGANIZED FILE TYPES
     search_window.bind("<Escape>", on_escape)
     
     # Set focus to quick search entry
-   # quick_entry.focus_set()
+    quick_entry.focus_set()
     
     # Load initial stats to show database status
     stats = searcher.get_search_stats()